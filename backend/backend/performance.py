@@ -0,0 +1,208 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware records wall time, ORM query count, database time and
+serialization time for every request. It reports them in a Server-Timing
+header and as sampled structured log lines on the 'backend.performance'
+logger, and keeps a window of recent samples per endpoint so percentiles can
+be read from the staff-only performance_stats endpoint.
+
+Queries are observed through execute wrappers registered with
+observe_queries(). They are kept in a context variable and called by one
+dispatching execute wrapper that install_dispatch() adds to every database
+connection, so they follow the request into sync_to_async threads, which is
+where an ASGI server runs the ORM.
+"""
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+logger = logging.getLogger('backend.performance')
+
+_current = ContextVar('request_metrics', default=None)
+_observers = ContextVar('query_observers', default=())
+_samples_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=settings.PERFORMANCE_SAMPLES_PER_ENDPOINT))
+
+# Endpoints are keyed by method and route, and requests can make up both, so
+# anything else is pooled to keep the number of sample windows bounded
+KNOWN_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+UNMATCHED = '<unmatched>'
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self._lock = threading.Lock()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.db_time += elapsed
+                self.queries += 1
+
+
+def _dispatch(execute, sql, params, many, context):
+    for observer in reversed(_observers.get()):
+        execute = functools.partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def install_dispatch(sender=None, connection=None, **kwargs):
+    """Add the observer dispatcher to connection; also a connection_created receiver."""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Pass every query run in this context through observer, an execute
+    wrapper, including queries of sync_to_async threads started from it.
+    """
+    for connection in connections.all(initialized_only=True):
+        install_dispatch(connection=connection)
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
+
+
+@contextmanager
+def serialization():
+    """Count the time spent in the block, minus any queries it runs, as serialization time."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started, db_before = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        metrics.serialize_time += (time.perf_counter() - started) - (metrics.db_time - db_before)
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, started = RequestMetrics(), time.perf_counter()
+        with self.measure(metrics):
+            response = self.render(self.get_response(request))
+        return self.record(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, started = RequestMetrics(), time.perf_counter()
+        with self.measure(metrics):
+            response = self.render(await self.get_response(request))
+        return self.record(request, response, metrics, started)
+
+    @staticmethod
+    @contextmanager
+    def measure(metrics):
+        token = _current.set(metrics)
+        try:
+            with observe_queries(metrics.record_query):
+                yield
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def render(response):
+        # DRF responses are rendered lazily; make sure that happens inside the measurement
+        if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+            with serialization():
+                response.render()
+        return response
+
+    @staticmethod
+    def record(request, response, metrics, started):
+        total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+        endpoint = f'{method} {match.route if match else UNMATCHED}'
+        sample = {
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'serialize_ms': round(metrics.serialize_time * 1000, 2),
+            'queries': metrics.queries,
+        }
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={sample["db_ms"]};desc="{metrics.queries} queries"',
+            f'serialize;dur={sample["serialize_ms"]}',
+            f'total;dur={sample["total_ms"]}',
+        ])
+
+        with _samples_lock:
+            _samples[endpoint].append(sample)
+
+        if sample['total_ms'] >= settings.PERFORMANCE_SLOW_REQUEST_MS or \
+                random.random() < settings.PERFORMANCE_LOG_SAMPLE_RATE:
+            logger.info(json.dumps(sample))
+        return response
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def endpoint_stats():
+    """p50/p95/p99 of each metric over the recent samples of every endpoint."""
+    with _samples_lock:
+        snapshot = {endpoint: list(samples) for endpoint, samples in _samples.items()}
+
+    stats = {}
+    for endpoint, samples in sorted(snapshot.items()):
+        stats[endpoint] = {'count': len(samples)}
+        for metric in ['total_ms', 'db_ms', 'serialize_ms', 'queries']:
+            values = sorted(sample[metric] for sample in samples)
+            stats[endpoint][metric] = {
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+            }
+    return stats
+
+
+def reset_stats():
+    with _samples_lock:
+        _samples.clear()
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def performance_stats(request):
+    return Response(endpoint_stats())
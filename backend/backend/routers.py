@@ -0,0 +1,150 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary ('default'). Reads go to the primary too,
+except inside replica_reads(), which the analytic read-only views use: there
+reads go to the REPLICA alias, unless the user wrote recently. Every write
+path pins its user to the primary for settings.REPLICA_PIN_SECONDS (see
+pin_to_primary), so users read their own writes while the replica catches
+up. The pin window must be longer than the replica's worst-case lag.
+
+The replica is only read once `manage.py sync_replica` has copied the primary
+into it, which it records in SYNC_TABLE, and only while that copy is at most
+settings.REPLICA_MAX_LAG_SECONDS old; otherwise everything reads from the
+primary. A view that fails on the replica with OperationalError (a copy taken
+before the latest migration, say) runs again on the primary, and that copy is
+not used again.
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+# Written into the replica by sync_replica after each copy
+SYNC_TABLE = 'replica_sync'
+
+_read_alias = ContextVar('read_alias', default=None)
+_failed_sync = None  # synced_at of a copy that raised OperationalError
+
+
+def _pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    if settings.REPLICA_PIN_SECONDS:
+        cache.set(_pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id), False)
+
+
+def replica_synced_at():
+    """Unix time of the replica's last sync_replica copy, or None if it has none."""
+    replica = connections[REPLICA]
+    name = replica.settings_dict['NAME']
+    # A replica that is the primary's own database (as a test mirror is) adds nothing but a second
+    # connection, and connecting to a missing SQLite file would create an empty one
+    if name == connections[DEFAULT_DB_ALIAS].settings_dict['NAME'] or not os.path.exists(name):
+        return None
+    try:
+        with replica.cursor() as cursor:
+            cursor.execute(f'SELECT MAX(synced_at) FROM {SYNC_TABLE}')
+            return cursor.fetchone()[0]
+    except OperationalError:
+        return None
+
+
+def replica_available():
+    if REPLICA not in settings.DATABASES:
+        return False
+    synced_at = replica_synced_at()
+    return (
+        synced_at is not None
+        and synced_at != _failed_sync
+        and time.time() - synced_at <= settings.REPLICA_MAX_LAG_SECONDS
+    )
+
+
+def read_alias():
+    """The database the ORM reads from in the current context."""
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads(user_id):
+    """
+    Send the ORM reads in this context to the replica if one is available and
+    user_id is not pinned. Yields the alias reads go to.
+    """
+    use_replica = user_id is not None and replica_available() and not is_pinned(user_id)
+    token = _read_alias.set(REPLICA if use_replica else None)
+    try:
+        yield read_alias()
+    finally:
+        _read_alias.reset(token)
+
+
+def _replica_failed(error):
+    global _failed_sync
+    _failed_sync = replica_synced_at()
+    logger.warning('Replica read failed, using the primary until the next sync: %s', error)
+
+
+def on_replica(user_id, func, /, *args, **kwargs):
+    """Call func under replica_reads(user_id), and again on the primary if the replica fails."""
+    with replica_reads(user_id) as alias:
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as error:
+            if alias != REPLICA:
+                raise
+            _replica_failed(error)
+    return func(*args, **kwargs)
+
+
+def reads_from_replica(view):
+    """Run a view taking a user_id URL argument, including its decorators, under on_replica()."""
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with replica_reads(kwargs.get('user_id')) as alias:
+                try:
+                    return await view(request, *args, **kwargs)
+                except OperationalError as error:
+                    if alias != REPLICA:
+                        raise
+                    _replica_failed(error)
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return on_replica(kwargs.get('user_id'), view, request, *args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary and gets its schema from there
+        return db != REPLICA
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -84,9 +85,94 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests; health checks drop broken ones
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts instead of upgrading a read
+            # lock later, which fails with "database is locked" without waiting
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Read-only copy of default for the reporting views, refreshed by
+    # `manage.py sync_replica` and only read once that has run (see
+    # backend/routers.py). Tests point it at the test database.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['backend.routers.PrimaryReplicaRouter']
+
+# After a write, a user's reads stay on the primary for this many seconds, so
+# they see their own changes while the replica catches up. Keep it above
+# REPLICA_MAX_LAG_SECONDS. Pins live in the default cache, which has to be
+# shared between processes in a multi-process deployment.
+REPLICA_PIN_SECONDS = 30
+
+# Reads go back to the primary once the replica's last sync is older than
+# this, so keep `sync_replica --interval` well below it, and it below the pin
+REPLICA_MAX_LAG_SECONDS = 20
+
+# Applied to every new SQLite connection by backend.sqlite.apply_profile
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers no longer block the writer and vice versa
+    'synchronous': 'NORMAL',  # fsync at checkpoints rather than every commit; safe with WAL
+    'busy_timeout': 5000,  # ms to wait for a lock before failing
+    'cache_size': -65536,  # negative means KiB: 64 MiB page cache
+    'mmap_size': 268435456,  # read through a 256 MiB memory map
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# LocMemCache evicts least recently used entries once MAX_ENTRIES is reached
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'finances',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
     }
 }
 
+# Cached reports and budget summaries (see finances/caching.py)
+FINANCE_CACHE_ALIAS = 'default'
+FINANCE_CACHE_TIMEOUT = 300
+
+# Per-process cache of category names (see finances/categories.py): seconds a
+# user's categories are kept, and how many users' categories are kept at once
+CATEGORY_CACHE_TIMEOUT = 300
+CATEGORY_CACHE_USERS = 10000
+
+# Request instrumentation (backend.performance): share of requests logged on
+# the 'backend.performance' logger, threshold above which every request is
+# logged, and recent samples kept per endpoint for the percentile endpoint.
+PERFORMANCE_LOG_SAMPLE_RATE = 0.05
+PERFORMANCE_SLOW_REQUEST_MS = 500
+PERFORMANCE_SAMPLES_PER_ENDPOINT = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'backend.performance': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'finances': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -133,6 +219,44 @@ AUTH_USER_MODEL = 'users.CustomUser'
 FRONTEND_URL = 'http://localhost:5173'  # Vite dev server URL
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
 
+# Outgoing mail is queued in users.OutgoingEmail and sent by `manage.py send_outbox`
+# (see users/outbox.py): messages per batch, attempts before a message is marked
+# failed, delay before the first retry (doubling after each), and how long a
+# worker holds claimed messages before another worker may retry them
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_SECONDS = 60
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+
+# API authentication: bearer access tokens are checked without touching the
+# database (see users/authentication.py); the session cookie still works for the
+# browser client and the browsable API
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.JWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+}
+
+# Sessions are read through the default cache and written through to the
+# database, so a request with a cached session does not query django_session.
+# The default cache has to be shared between processes for that to hold in a
+# multi-process deployment; otherwise each process falls back to the database once.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# The user behind a session is looked up in a per-process cache (see
+# users/usercache.py): seconds a user is kept, and how many users are kept at once
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60
+USER_CACHE_SIZE = 10000
+
+# Tokens issued by the login and token-refresh endpoints (see users/tokens.py)
+JWT_SIGNING_KEY = SECRET_KEY
+JWT_ALGORITHM = 'HS256'
+JWT_ACCESS_TOKEN_SECONDS = 300
+JWT_REFRESH_TOKEN_SECONDS = 7 * 24 * 60 * 60
+
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
 ]
@@ -0,0 +1,18 @@
+"""
+SQLite connection profile.
+
+apply_profile() is connected to django.db.backends.signals.connection_created
+and runs the PRAGMAs in settings.SQLITE_PRAGMAS on every new SQLite
+connection. Most of these PRAGMAs are per-connection, so they have to be
+reapplied whenever Django opens a connection; journal_mode=WAL is persisted
+in the database file.
+"""
+from django.conf import settings
+
+
+def apply_profile(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Straight on the sqlite3 connection, so request instrumentation does not count them
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.http import JsonResponse
+from .performance import performance_stats
 
 @ensure_csrf_cookie
 def get_csrf(request):
@@ -27,5 +28,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),       
     path('api/users/', include('users.urls')),
     path('api/csrf/', get_csrf),
-    path('api/finances/', include('finances.urls'))
+    path('api/finances/', include('finances.urls')),
+    path('api/debug/performance/', performance_stats),
 ]
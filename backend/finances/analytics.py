@@ -0,0 +1,128 @@
+"""
+Spending analytics: per-category monthly series, rolling means,
+month-over-month changes, percentiles and an end-of-month projection.
+
+Everything is derived from one grouped query (expense cents per category and
+day), loaded into flat NumPy arrays and reduced into a category x month
+matrix, so a long history costs one query and a few array operations. The
+series cover complete months; the current month is reported as the amount
+spent so far plus a projection.
+"""
+import calendar
+import math
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import BigIntegerField, Sum
+
+from . import categories
+from .models import Expense
+
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 120
+ROLLING_MONTHS = 3
+PROJECTION_DAYS = 90  # Daily spending rate for the projection is averaged over this many days
+PERCENTILES = (25, 50, 75, 90)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _amounts(values):
+    """Cents (any numeric array) -> list of amounts, with NaN as None."""
+    return [None if math.isnan(value) else value for value in (np.asarray(values, dtype=float) / 100).round(2).tolist()]
+
+
+def _amounts_2d(values):
+    return [_amounts(row) for row in values]
+
+
+def _statistics(monthly, month_to_date, daily_rate, days_left, months):
+    """
+    Compute every statistic for each row of a (series x month) matrix of
+    complete months in cents; returns one dict per row.
+    """
+    rows, count = monthly.shape
+    cumulative = np.concatenate([np.zeros((rows, 1)), np.cumsum(monthly, axis=1)], axis=1)
+    rolling = np.full((rows, count), np.nan)
+    if count >= ROLLING_MONTHS:
+        rolling[:, ROLLING_MONTHS - 1:] = (cumulative[:, ROLLING_MONTHS:] - cumulative[:, :-ROLLING_MONTHS]) / ROLLING_MONTHS
+    change = np.diff(monthly, axis=1, prepend=np.nan)
+    percentiles = (
+        np.percentile(monthly, PERCENTILES, axis=1).T if count else np.full((rows, len(PERCENTILES)), np.nan)
+    )
+    projected = month_to_date + daily_rate * days_left
+
+    shown = slice(max(count - months, 0), count)
+    monthly, rolling, change = _amounts_2d(monthly[:, shown]), _amounts_2d(rolling[:, shown]), _amounts_2d(change[:, shown])
+    percentiles = _amounts_2d(percentiles)
+    month_to_date, projected = _amounts(month_to_date), _amounts(projected)
+    return [
+        {
+            'monthly': monthly[row],
+            'rolling_mean': rolling[row],
+            'month_over_month': change[row],
+            'percentiles': {f'p{p}': value for p, value in zip(PERCENTILES, percentiles[row])},
+            'month_to_date': month_to_date[row],
+            'projected': projected[row],
+        }
+        for row in range(rows)
+    ]
+
+
+def daily_totals(user_id):
+    """(category id, date, cents) rows of the user's spending per category and day."""
+    # Grouped in the order of the covering (user, category, date, expense) index, so SQLite
+    # neither reads the table nor sorts
+    return (
+        Expense.objects.filter(user_id=user_id)
+        .values_list('category', 'date')
+        # The raw cents, rather than a Decimal per row
+        .annotate(total=Sum('expense', output_field=BigIntegerField()))
+        .order_by()
+    )
+
+
+def spending_analytics(user_id, today, months=DEFAULT_MONTHS):
+    """
+    Return the spending_analytics payload as of today, with series for the
+    last `months` complete months.
+    """
+    # Entries dated after today are dropped below, to keep the query on the index
+    rows = daily_totals(user_id)
+    category_ids, days, cents = zip(*rows) if rows else ((), (), ())
+    category_ids = np.array(category_ids, dtype=np.int64)
+    # Day numbers convert to datetime64 an order of magnitude faster than date objects
+    days = (np.array([day.toordinal() for day in days], dtype=np.int64) - EPOCH_ORDINAL).astype('datetime64[D]')
+    cents = np.array(cents, dtype=np.int64)
+    past = days <= np.datetime64(today, 'D')
+    category_ids, column = np.unique(category_ids[past], return_inverse=True)
+    days, cents = days[past], cents[past]
+
+    current_month = np.datetime64(today, 'M')
+    first_month = days.min().astype('datetime64[M]') if len(days) else current_month
+    month_count = int((current_month - first_month).astype(int)) + 1
+
+    # Category x month totals, the last column being the current month so far
+    by_month = np.zeros((len(category_ids), month_count), dtype=np.int64)
+    np.add.at(by_month, (column, (days.astype('datetime64[M]') - first_month).astype(int)), cents)
+    recent = days > np.datetime64(today - timedelta(days=PROJECTION_DAYS), 'D')
+    daily_rate = np.bincount(column[recent], weights=cents[recent], minlength=len(category_ids)) / PROJECTION_DAYS
+
+    # One more row for the total over all categories
+    by_month = np.vstack([by_month, by_month.sum(axis=0)])
+    daily_rate = np.append(daily_rate, daily_rate.sum())
+    days_left = calendar.monthrange(today.year, today.month)[1] - today.day
+    statistics = _statistics(by_month[:, :-1], by_month[:, -1], daily_rate, days_left, months)
+
+    names = categories.names(user_id)
+    shown_months = np.arange(max(first_month, current_month - months), current_month)
+    return {
+        'as_of': today.isoformat(),
+        'months': [str(month) for month in shown_months],
+        'rolling_months': ROLLING_MONTHS,
+        'categories': sorted(
+            ({'category': names[int(category_id)], **stats} for category_id, stats in zip(category_ids, statistics)),
+            key=lambda item: item['category']
+        ),
+        'total': statistics[-1],
+    }
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class FinancesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finances'
+
+    def ready(self):
+        from backend.sqlite import apply_profile
+        connection_created.connect(apply_profile, dispatch_uid='backend.sqlite.apply_profile')
+        from backend.performance import install_dispatch
+        connection_created.connect(install_dispatch, dispatch_uid='backend.performance.install_dispatch')
+
+        from . import categories
+        post_migrate.connect(categories.clear, dispatch_uid='finances.categories.clear')
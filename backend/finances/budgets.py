@@ -0,0 +1,123 @@
+"""
+Budget vs. actual spending per category and month, over any range of months.
+
+The budgets come from one GROUP BY over the MonthlyBudget period index and the
+spending from one rollups.monthly_totals() call. Both are scattered into
+month x category arrays of cents, and remaining amounts, utilisation and alert
+status are computed for the whole grid at once with NumPy.
+"""
+from datetime import date
+
+import numpy as np
+from django.db.models import Sum
+
+from . import categories, rollups
+from .fields import from_cents, to_cents
+from .models import MonthlyBudget
+
+BUDGET_WARNING_PERCENT = 80
+BUDGET_EXCEEDED_PERCENT = 100
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 120
+
+STATUS_OK = 'ok'
+STATUS_WARNING = 'warning'
+STATUS_EXCEEDED = 'exceeded'
+STATUS_UNBUDGETED = 'unbudgeted'
+
+
+def months_between(start, end):
+    """First days of the months from start's month to end's month, inclusive."""
+    first, last = start.year * 12 + start.month - 1, end.year * 12 + end.month - 1
+    return [date(index // 12, index % 12 + 1, 1) for index in range(first, last + 1)]
+
+
+def default_start(end):
+    """First day of the range of DEFAULT_MONTHS months ending with end's month."""
+    index = end.year * 12 + end.month - DEFAULT_MONTHS
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _amount(cents):
+    return float(from_cents(cents))
+
+
+def _grid(rows, shape):
+    """Sum (month index, category index, cents) triples into a month x category array."""
+    grid = np.zeros(shape, dtype=np.int64)
+    if rows:
+        month_index, category_index, cents = np.array(rows, dtype=np.int64).T
+        np.add.at(grid, (month_index, category_index), cents)
+    return grid
+
+
+def budget_vs_actual(user_id, start, end):
+    """
+    Return the budget_trends payload for start..end (dates, inclusive): per
+    month, the budget, actual spending and remaining amount overall and for
+    every category that has a budget or spending that month.
+    """
+    months = months_between(start, end)
+    month_index = {MonthlyBudget.period_of(month): index for index, month in enumerate(months)}
+
+    budget_rows = MonthlyBudget.objects.filter(
+        user_id=user_id,
+        period__range=(MonthlyBudget.period_of(start), MonthlyBudget.period_of(end))
+    ).values('period', 'category').annotate(total=Sum('amount')).order_by()
+    budget_rows = [row for row in budget_rows if row['period'] in month_index]  # Skips malformed months
+    actual_rows = rollups.monthly_totals(user_id, start, end, kinds=(rollups.EXPENSE,))
+
+    category_ids = sorted({row['category'] for row in budget_rows} | {row['category'] for row in actual_rows})
+    category_index = {category_id: index for index, category_id in enumerate(category_ids)}
+    shape = (len(months), len(category_ids))
+
+    budget = _grid([
+        (month_index[row['period']], category_index[row['category']], to_cents(row['total']))
+        for row in budget_rows
+    ], shape)
+    actual = _grid([
+        (month_index[MonthlyBudget.period_of(row['month'])], category_index[row['category']], to_cents(row['total']))
+        for row in actual_rows
+    ], shape)
+
+    remaining = budget - actual
+    budgeted = budget > 0
+    percentage = np.divide(actual * 100, budget, out=np.full(shape, np.nan), where=budgeted)
+    status = np.select(
+        [~budgeted, percentage >= BUDGET_EXCEEDED_PERCENT, percentage >= BUDGET_WARNING_PERCENT],
+        [STATUS_UNBUDGETED, STATUS_EXCEEDED, STATUS_WARNING],
+        STATUS_OK,
+    )
+    shown = (budget != 0) | (actual != 0)
+
+    names = categories.names(user_id)
+    month_budget, month_actual = budget.sum(axis=1).tolist(), actual.sum(axis=1).tolist()
+    budget, actual, remaining = budget.tolist(), actual.tolist(), remaining.tolist()
+    percentage, status = percentage.round(2).tolist(), status.tolist()
+
+    cells = [[] for _ in months]
+    for month, column in zip(*np.nonzero(shown)):
+        month, column = int(month), int(column)
+        cells[month].append({
+            'category': names[category_ids[column]],
+            'budget': _amount(budget[month][column]),
+            'actual': _amount(actual[month][column]),
+            'remaining': _amount(remaining[month][column]),
+            'percentage': None if status[month][column] == STATUS_UNBUDGETED else percentage[month][column],
+            'status': status[month][column],
+        })
+
+    return {
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'months': [
+            {
+                'month': month.strftime('%Y-%m'),
+                'budget': _amount(month_budget[index]),
+                'actual': _amount(month_actual[index]),
+                'remaining': _amount(month_budget[index] - month_actual[index]),
+                'categories': cells[index],
+            }
+            for index, month in enumerate(months)
+        ],
+    }
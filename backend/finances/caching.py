@@ -0,0 +1,107 @@
+"""
+Versioned response caching for the finance read endpoints.
+
+Each user has a data version that every write to their incomes, expenses or
+budgets bumps in the same transaction. Cache keys include that version, so a
+write makes every cached result for the user unreachable at once and stale
+entries simply age out of the cache (LRU / TTL).
+"""
+import hashlib
+import json
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+from backend import routers
+
+from .models import DataVersion
+
+_stats_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def bump_version(user_id):
+    """
+    Invalidate everything cached for a user and pin their reads to the primary
+    database. Call inside the write's transaction.
+    """
+    routers.pin_to_primary(user_id)
+    versions = DataVersion.objects.filter(user_id=user_id)
+    if versions.update(version=F('version') + 1):
+        return
+    _, created = DataVersion.objects.get_or_create(user_id=user_id, defaults={'version': 1})
+    if not created:
+        versions.update(version=F('version') + 1)
+
+
+def data_version(user_id):
+    return DataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+def cache_key(name, user_id, version, params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'finances:{name}:{user_id}:{version}:{digest}'
+
+
+def etag_func(name, daily=False):
+    """
+    Build an etag_func for django.views.decorators.http.condition. The ETag
+    only depends on the user's data version and the query string, so a
+    matching If-None-Match is answered with 304 before the view runs. Views
+    whose output also depends on today's date pass daily=True.
+    """
+    def etag(request, user_id, *args, **kwargs):
+        params = sorted(request.GET.lists())
+        if daily:
+            params.append(('today', timezone.localdate().isoformat()))
+        return cache_key(name, user_id, data_version(user_id), params).replace(':', '-')
+    return etag
+
+
+def cached(name, user_id, params, compute):
+    """
+    Return compute() for a user's data and request parameters, serving it from
+    the cache while the user's data version is unchanged. Exceptions raised by
+    compute() propagate and nothing is cached.
+    """
+    cache = caches[settings.FINANCE_CACHE_ALIAS]
+    key = cache_key(name, user_id, data_version(user_id), params)
+    value = cache.get(key)
+    if value is not None:
+        _record(_hits, name)
+        return value
+
+    _record(_misses, name)
+    value = compute()
+    cache.set(key, value, settings.FINANCE_CACHE_TIMEOUT)
+    return value
+
+
+def _record(counter, name):
+    with _stats_lock:
+        counter[name] += 1
+
+
+def stats():
+    """Hit and miss counts per cached endpoint for this process."""
+    with _stats_lock:
+        names = sorted(set(_hits) | set(_misses))
+        return {
+            name: {
+                'hits': _hits[name],
+                'misses': _misses[name],
+                'hit_rate': _hits[name] / (_hits[name] + _misses[name]),
+            }
+            for name in names
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _hits.clear()
+        _misses.clear()
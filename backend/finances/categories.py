@@ -0,0 +1,129 @@
+"""
+Per-user category names, interned as Category rows.
+
+Entries, budgets and rollups store a category id, so grouping, filtering and
+indexing compare small integers. The API still speaks names: views turn
+request names into ids with find() / get_or_create(), and serializers turn
+ids back into names with names(). Each user's categories are loaded in one
+query and kept in a process-local LRU cache for settings.CATEGORY_CACHE_TIMEOUT
+seconds, so serializing a page of entries does not touch the Category table.
+
+Only committed rows are cached (see _remember), because a rolled back
+category id could otherwise be handed out again. Renaming a category is a
+single-row UPDATE; other processes pick the new name up when their cached copy
+expires.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching
+from .models import Category
+
+DEFAULT_INCOME = 'income'
+DEFAULT_EXPENSE = 'expenses'
+
+# Never a primary key, so filtering on it matches nothing
+NO_CATEGORY = 0
+
+_Entry = namedtuple('_Entry', ['loaded_at', 'ids', 'names'])
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # user id -> _Entry, least recently used first
+
+
+class Names(dict):
+    """Category id -> name for one user; an id missing from the cached copy triggers one reload."""
+
+    def __init__(self, user_id, names):
+        super().__init__(names)
+        self.user_id = user_id
+
+    def __missing__(self, category_id):
+        self.update(_entry(self.user_id, refresh=True).names)
+        return super().__getitem__(category_id)
+
+
+def _remember(user_id, entry):
+    with _lock:
+        _cache[user_id] = entry
+        _cache.move_to_end(user_id)
+        while len(_cache) > settings.CATEGORY_CACHE_USERS:
+            _cache.popitem(last=False)
+
+
+def _entry(user_id, refresh=False):
+    now = time.monotonic()
+    if not refresh:
+        with _lock:
+            entry = _cache.get(user_id)
+            if entry is not None and now - entry.loaded_at < settings.CATEGORY_CACHE_TIMEOUT:
+                _cache.move_to_end(user_id)
+                return entry
+
+    ids = dict(Category.objects.filter(user_id=user_id).values_list('name', 'id'))
+    entry = _Entry(now, ids, {category_id: name for name, category_id in ids.items()})
+    # Runs immediately outside a transaction, and not at all if this one rolls back
+    transaction.on_commit(lambda: _remember(user_id, entry))
+    return entry
+
+
+def names(user_id):
+    """Return a Names mapping of the user's category ids to names."""
+    return Names(user_id, _entry(user_id).names)
+
+
+def find(user_id, name):
+    """Return the id of the user's category called name, or NO_CATEGORY if there is none."""
+    category_id = _entry(user_id).ids.get(name)
+    if category_id is None:
+        # It may have been created by another process since the cache was filled
+        category_id = _entry(user_id, refresh=True).ids.get(name, NO_CATEGORY)
+    return category_id
+
+
+def get_or_create_many(user_id, category_names):
+    """Return {name: id} for category_names, creating the user's missing categories."""
+    category_names = set(category_names)
+    if not category_names:
+        return {}
+    ids = _entry(user_id).ids
+    if not category_names <= ids.keys():
+        Category.objects.bulk_create(
+            [Category(user_id=user_id, name=name) for name in category_names - ids.keys()],
+            ignore_conflicts=True,
+        )
+        ids = _entry(user_id, refresh=True).ids
+    return {name: ids[name] for name in category_names}
+
+
+def get_or_create(user_id, name):
+    return get_or_create_many(user_id, [name])[name]
+
+
+def rename(user_id, category_id, name):
+    """
+    Rename one of a user's categories with a single-row UPDATE. Returns False if
+    the category does not exist; raises IntegrityError if the user already has
+    a category with the new name.
+    """
+    with transaction.atomic():
+        renamed = Category.objects.filter(id=category_id, user_id=user_id).update(name=name)
+        if renamed:
+            caching.bump_version(user_id)
+    transaction.on_commit(lambda: forget(user_id))
+    return bool(renamed)
+
+
+def forget(user_id):
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+def clear(**kwargs):
+    """Empty the cache; also a post_migrate receiver, as flushing the database reuses ids."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,146 @@
+"""
+Incomes and expenses as one date-ordered stream.
+
+Both tables are projected onto the same columns and combined with UNION ALL,
+so ordering, limits and keyset filtering all happen in the database and the
+result can be iterated lazily.
+"""
+import csv
+import json
+
+from django.db.models import CharField, F, Q, Value
+
+from . import categories
+from .models import Income, Expense
+
+ENTRY_FIELDS = ('id', 'type', 'category', 'amount', 'title', 'description', 'date')
+ENTRY_ORDERING = ('date', 'type', 'id')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_LINES_PER_WRITE = 500
+
+
+def filter_entries(user_id, start_date=None, end_date=None, category=None):
+    """Return the (incomes, expenses) querysets for the finance_details filters."""
+    incomes = Income.objects.filter(user_id=user_id)
+    expenses = Expense.objects.filter(user_id=user_id)
+
+    # Apply date range filter if provided
+    if start_date and end_date:
+        incomes = incomes.filter(date__range=[start_date, end_date])
+        expenses = expenses.filter(date__range=[start_date, end_date])
+
+    # Apply category filter if provided ('all' means no category filter)
+    if category and category != 'all':
+        category_id = categories.find(user_id, category)
+        incomes = incomes.filter(category_id=category_id)
+        expenses = expenses.filter(category_id=category_id)
+
+    return incomes, expenses
+
+
+def _project(queryset, entry_type, amount_field):
+    return queryset.annotate(
+        type=Value(entry_type, output_field=CharField()),
+        amount=F(amount_field),
+    ).values(*ENTRY_FIELDS).order_by()
+
+
+def after_cursor(queryset, entry_type, cursor, descending=False):
+    """
+    Keep rows of one table whose (date, type, id) sorts after the cursor.
+    The same-type filters repeat the date bound outside the OR, so SQLite
+    seeks the (user, date) index to the cursor instead of scanning from the
+    user's first row.
+    """
+    cursor_date, cursor_type, cursor_id = cursor
+    if descending:
+        if entry_type < cursor_type:
+            return queryset.filter(date__lte=cursor_date)
+        if entry_type > cursor_type:
+            return queryset.filter(date__lt=cursor_date)
+        return queryset.filter(Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id), date__lte=cursor_date)
+    if entry_type > cursor_type:
+        return queryset.filter(date__gte=cursor_date)
+    if entry_type < cursor_type:
+        return queryset.filter(date__gt=cursor_date)
+    return queryset.filter(Q(date__gt=cursor_date) | Q(date=cursor_date, id__gt=cursor_id), date__gte=cursor_date)
+
+
+def merged_entries(incomes, expenses, entry_type='', cursor=None, descending=False):
+    """
+    Return a lazy values() queryset of incomes and expenses ordered by
+    (date, type, id), optionally restricted to one type and to rows after a
+    keyset cursor. Expense amounts are positive here; see entry_to_json().
+    """
+    branches = []
+    if entry_type in ['', 'income']:
+        if cursor:
+            incomes = after_cursor(incomes, 'income', cursor, descending)
+        branches.append(_project(incomes, 'income', 'income'))
+    if entry_type in ['', 'expense']:
+        if cursor:
+            expenses = after_cursor(expenses, 'expense', cursor, descending)
+        branches.append(_project(expenses, 'expense', 'expense'))
+
+    ordering = [f'-{name}' for name in ENTRY_ORDERING] if descending else list(ENTRY_ORDERING)
+    if not branches:
+        return Income.objects.none().values(*ENTRY_FIELDS)
+    if len(branches) == 1:
+        return branches[0].order_by(*ordering)
+    return branches[0].union(branches[1], all=True).order_by(*ordering)
+
+
+def entry_to_json(row, category_names):
+    """
+    Turn a merged_entries() row into the finance_details JSON shape;
+    category_names is the user's categories.names() mapping.
+    """
+    amount = float(row['amount'])
+    return {
+        'id': row['id'],
+        'type': row['type'],
+        'category': category_names[row['category']],
+        'amount': amount if row['type'] == 'income' else amount * -1,
+        'title': row['title'],
+        'description': row['description'],
+        'date': row['date'].isoformat(),
+    }
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(rows, export_format, category_names):
+    """
+    Yield an export of merged_entries() rows as CSV or newline-delimited JSON,
+    a few hundred lines at a time, without holding the whole history in memory.
+    """
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        header = writer.writerow(ENTRY_FIELDS)
+
+        def encode(entry):
+            return writer.writerow([entry[field] for field in ENTRY_FIELDS])
+    else:
+        header = None
+
+        def encode(entry):
+            return json.dumps(entry) + '\n'
+
+    lines = [header] if header else []
+    for row in rows:
+        lines.append(encode(entry_to_json(row, category_names)))
+        if len(lines) >= EXPORT_LINES_PER_WRITE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
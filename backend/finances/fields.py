@@ -0,0 +1,73 @@
+from decimal import Decimal, InvalidOperation
+
+from django import forms
+from django.core import validators
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+CENT = Decimal('0.01')
+
+
+def to_cents(amount):
+    """Decimal (or anything Decimal() accepts) -> integer cents, rounding half to even."""
+    return int(Decimal(amount).quantize(CENT) * 100)
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    An amount of money stored as integer cents. Python values are Decimals with
+    at most two decimal places, so code using it reads like a DecimalField,
+    while the database sums and compares plain integers.
+    """
+    description = _('Amount of money stored as integer cents')
+    default_error_messages = {
+        'invalid': _('“%(value)s” value must be a decimal number.'),
+    }
+
+    def __init__(self, *args, max_digits=10, **kwargs):
+        self.max_digits = max_digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['max_digits'] = self.max_digits
+        return name, path, args, kwargs
+
+    @property
+    def validators(self):
+        # In place of the integer range checks, which would compare cents with a Decimal
+        return [*self.default_validators, *self._validators, validators.DecimalValidator(self.max_digits, 2)]
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            # repr() keeps floats such as 0.1 from turning into 0.1000000000000000055...
+            value = Decimal(repr(value) if isinstance(value, float) else str(value).strip())
+        except (InvalidOperation, ValueError, TypeError):
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+        if not value.is_finite():
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+        return value
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return value
+        return to_cents(self.to_python(value))
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else from_cents(value)
+
+    def formfield(self, **kwargs):
+        return super(models.IntegerField, self).formfield(**{
+            'max_digits': self.max_digits,
+            'decimal_places': 2,
+            'form_class': forms.DecimalField,
+            **kwargs,
+        })
@@ -0,0 +1,355 @@
+import json
+import time
+from datetime import date
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from backend.performance import percentile
+from finances import categories, rollups, seeding
+from finances.models import Expense, MonthlyBudget
+from users import tokens, usercache
+
+# Each scenario is a generator yielding one zero-argument request per
+# iteration. Setup code between yields (creating rows to delete, minting
+# tokens, logging in) is not timed.
+
+
+def _json(client, method, path, data):
+    return getattr(client, method)(path, json.dumps(data), content_type='application/json')
+
+
+def _consume(response):
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _month_range():
+    today = date.today()
+    return today.replace(day=1).isoformat(), today.isoformat()
+
+
+def add_income(client, user, count):
+    url = reverse('add-income')
+    for n in range(count):
+        data = {'user_id': user.id, 'amount': '250.00', 'date': date.today().isoformat(), 'title': f'Bonus {n}'}
+        yield lambda: _json(client, 'post', url, data)
+
+
+def add_expense(client, user, count):
+    url = reverse('add-expense')
+    for n in range(count):
+        data = {'user_id': user.id, 'amount': '12.50', 'category': 'food', 'date': date.today().isoformat(),
+                'title': f'Lunch {n}'}
+        yield lambda: _json(client, 'post', url, data)
+
+
+def add_batch(client, user, count):
+    url = reverse('add-batch')
+    for n in range(count):
+        data = {'user_id': user.id, 'entries': [
+            {'type': 'expense', 'amount': '4.20', 'category': 'food', 'date': date.today().isoformat(),
+             'title': f'Coffee {n}-{i}'}
+            for i in range(100)
+        ]}
+        yield lambda: _json(client, 'post', url, data)
+
+
+def import_statement(client, user, count):
+    url = reverse('import-statement')
+    for n in range(count):
+        lines = ['Date,Description,Amount'] + [
+            f'{date.today().isoformat()},Card payment {n}-{i},-{i % 50 + 1}.99' for i in range(100)
+        ]
+        upload = SimpleUploadedFile('statement.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        yield lambda: client.post(url, {'user_id': user.id, 'file': upload})
+
+
+def budget(client, user, count):
+    url = reverse('budget')
+    start, end = _month_range()
+    for _ in range(count):
+        yield lambda: _json(client, 'post', url, {'user_id': user.id, 'start_date': start, 'end_date': end})
+
+
+def finance_details(client, user, count):
+    url = reverse('finance_details', args=[user.id])
+    for _ in range(count):
+        yield lambda: client.get(url, {'order': 'desc'})
+
+
+def dashboard_summary(client, user, count):
+    url = reverse('dashboard_summary', args=[user.id])
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+def export_finance_entries(client, user, count):
+    url = reverse('export_finance_entries', args=[user.id])
+    for _ in range(count):
+        yield lambda: _consume(client.get(url))
+
+
+def budget_details(client, user, count):
+    url = reverse('budget_details', args=[user.id])
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+def budget_trends(client, user, count):
+    url = reverse('budget_trends', args=[user.id])
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+def update_budget_entry(client, user, count):
+    entry = MonthlyBudget.objects.filter(user=user).latest('id')
+    url = reverse('update_budget_entry', args=[user.id, entry.id])
+    for n in range(count):
+        yield lambda: _json(client, 'patch', url, {'amount': f'{300 + n}.00'})
+
+
+def delete_budget_entry(client, user, count):
+    period = date.today()
+    other = categories.get_or_create(user.id, 'other')
+    created = MonthlyBudget.objects.bulk_create(
+        MonthlyBudget(user=user, title=f'Temp {n}', category_id=other, month=str(period.month).zfill(2),
+                      year=period.year, amount='10.00')
+        for n in range(count)
+    )
+    for entry in created:
+        url = reverse('delete_budget_entry', args=[user.id, entry.id])
+        yield lambda: client.delete(url)
+
+
+def update_finance_entry(client, user, count):
+    entry = Expense.objects.filter(user=user).latest('id')
+    url = reverse('update_finance_entry', args=[user.id, entry.id])
+    for n in range(count):
+        yield lambda: _json(client, 'patch', url, {'type': 'expense', 'amount': f'{20 + n}.00'})
+
+
+def delete_finance_entry(client, user, count):
+    other = categories.get_or_create(user.id, 'other')
+    created = Expense.objects.bulk_create(
+        Expense(user=user, title=f'Temp {n}', category_id=other, expense='10.00', date=date.today())
+        for n in range(count)
+    )
+    rollups.entries_added(created)
+    for entry in created:
+        url = reverse('delete_finance_entry', args=[user.id, entry.id])
+        yield lambda: _json(client, 'delete', url, {'type': 'expense'})
+
+
+def get_reports(client, user, count):
+    url = reverse('get_reports', args=[user.id])
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+def spending_analytics(client, user, count):
+    url = reverse('spending_analytics', args=[user.id])
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+def set_monthly_budget(client, user, count):
+    url = reverse('set-monthly-budget')
+    period = date.today()
+    for n in range(count):
+        data = {'title': f'Goal {n}', 'category': 'travel', 'amount': '500.00', 'month': period.month,
+                'year': period.year}
+        yield lambda: _json(client, 'post', url, data)
+
+
+def cache_stats(client, user, count):
+    url = reverse('cache_stats')
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+def register(client, user, count):
+    url = reverse('register')
+    for n in range(count):
+        email = f'register-{user.id}-{n}@example.com'
+        data = {'email': email, 'username': email.split('@')[0], 'password': seeding.SEED_PASSWORD,
+                'password2': seeding.SEED_PASSWORD}
+        yield lambda: _json(client, 'post', url, data)
+
+
+def login(client, user, count):
+    url = reverse('login')
+    for _ in range(count):
+        yield lambda: _json(client, 'post', url, {'email': user.email, 'password': seeding.SEED_PASSWORD})
+
+
+def token_refresh(client, user, count):
+    url = reverse('token-refresh')
+    refresh = tokens.issue(user)['refresh']
+    for _ in range(count):
+        yield lambda: _json(client, 'post', url, {'refresh': refresh})
+
+
+def logout(client, user, count):
+    url = reverse('logout')
+    for _ in range(count):
+        client.force_login(user)
+        yield lambda: client.post(url)
+    client.force_login(user)
+
+
+def password_reset(client, user, count):
+    url = reverse('password-reset')
+    for _ in range(count):
+        yield lambda: _json(client, 'post', url, {'email': user.email})
+
+
+def password_reset_confirm(client, user, count):
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    for _ in range(count):
+        # The token changes with every password change, so mint a fresh one each time
+        user.refresh_from_db()
+        url = reverse('password-reset-confirm', args=[uid, default_token_generator.make_token(user)])
+        data = {'password': seeding.SEED_PASSWORD, 'password2': seeding.SEED_PASSWORD}
+        yield lambda: _json(client, 'post', url, data)
+    user.refresh_from_db()
+
+
+def csrf(client, user, count):
+    url = reverse('csrf')
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+def user_details(client, user, count):
+    url = reverse('user-details')
+    for _ in range(count):
+        yield lambda: client.get(url)
+
+
+# URL name -> scenario, covering every route in finances/urls.py and users/urls.py
+SCENARIOS = {
+    'add-income': add_income,
+    'add-expense': add_expense,
+    'add-batch': add_batch,
+    'import-statement': import_statement,
+    'budget': budget,
+    'finance_details': finance_details,
+    'dashboard_summary': dashboard_summary,
+    'export_finance_entries': export_finance_entries,
+    'budget_details': budget_details,
+    'budget_trends': budget_trends,
+    'update_budget_entry': update_budget_entry,
+    'delete_budget_entry': delete_budget_entry,
+    'delete_finance_entry': delete_finance_entry,
+    'update_finance_entry': update_finance_entry,
+    'get_reports': get_reports,
+    'spending_analytics': spending_analytics,
+    'set-monthly-budget': set_monthly_budget,
+    'cache_stats': cache_stats,
+    'register': register,
+    'login': login,
+    'token-refresh': token_refresh,
+    'logout': logout,
+    'password-reset': password_reset,
+    'password-reset-confirm': password_reset_confirm,
+    'csrf': csrf,
+    'user-details': user_details,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every finances and users endpoint through the test client against a user seeded '
+        'with each requested number of rows, and report p50/p95/p99 latency and throughput with every '
+        'cache emptied before each request (cold) and after a warm-up request (warm). '
+        'Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000],
+                            help='Income and expense rows per benchmarked user.')
+        parser.add_argument('--requests', type=int, default=30, help='Requests per endpoint and size.')
+        parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), help='Only run these endpoints.')
+        parser.add_argument('--skip', nargs='+', choices=sorted(SCENARIOS), default=[],
+                            help='Skip these endpoints.')
+        parser.add_argument('--auth', choices=['session', 'token'], default='session',
+                            help='Authenticate with a session cookie or a bearer access token.')
+
+    def handle(self, *args, **options):
+        names = [name for name in (options['only'] or SCENARIOS) if name not in options['skip']]
+
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            # Keep the request log quiet; every request would count as slow at the larger sizes
+            with override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0, PERFORMANCE_SLOW_REQUEST_MS=float('inf')):
+                for size in options['sizes']:
+                    self.run(size, names, options['requests'], options['auth'])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+    def run(self, size, names, count, auth='session'):
+        started = time.perf_counter()
+        user, = seeding.create_users(1, prefix=f'benchmark-{size}', staff=True)
+        incomes = size // 10
+        seeding.seed_user(user, incomes, size - incomes, budgets=120)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{size} rows per user (seeded in {time.perf_counter() - started:.1f} s)'
+        ))
+        self.stdout.write(
+            f'  {"endpoint":<24} {"cold p50":>9} {"cold p95":>9} {"cold p99":>9} {"cold/s":>9} '
+            f'{"warm p50":>9} {"warm p95":>9} {"warm p99":>9} {"warm/s":>9} {"errors":>7}'
+        )
+
+        for name in names:
+            if auth == 'token':
+                # Minted per endpoint, so a long run never outlives the access token
+                client = Client(headers={'Authorization': f'Bearer {tokens.issue(user)["access"]}'})
+            else:
+                client = Client()
+                client.force_login(user)
+            cold, cold_errors = self.time_requests(SCENARIOS[name](client, user, count), cold=True)
+            requests = SCENARIOS[name](client, user, count + 1)
+            next(requests)()  # Warm-up
+            warm, warm_errors = self.time_requests(requests, cold=False)
+
+            self.stdout.write(
+                f'  {name:<24} '
+                + ' '.join(self.columns(cold) + self.columns(warm))
+                + f' {cold_errors + warm_errors:7d}'
+            )
+
+    @staticmethod
+    def columns(timings):
+        """p50/p95/p99 in milliseconds and requests per second of timed (sorted) requests."""
+        return [f'{percentile(timings, fraction) * 1000:9.2f}' for fraction in [0.50, 0.95, 0.99]] + [
+            f'{len(timings) / sum(timings):9.1f}'
+        ]
+
+    @staticmethod
+    def time_requests(requests, cold):
+        timings, errors = [], 0
+        for request in requests:
+            if cold:
+                # Cached results and data versions, sessions, category names and users
+                cache.clear()
+                categories.clear()
+                usercache.clear()
+            request_started = time.perf_counter()
+            response = request()
+            timings.append(time.perf_counter() - request_started)
+            errors += response.status_code >= 400
+        return sorted(timings), errors
@@ -0,0 +1,86 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from finances import categories, entries
+from finances.models import Income, Expense
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare merging incomes and expenses by sorting in Python against the UNION ALL queryset. '
+        'Rows are generated inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.run(size, options['page_size'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, size, page_size):
+        user = User.objects.create(username='benchmark-merge', email='benchmark-merge@example.com')
+        start = date(2000, 1, 1)
+        rng = random.Random(size)
+
+        def day():
+            return start + timedelta(days=rng.randrange(365 * 20))
+
+        incomes = size // 4
+        category_ids = categories.get_or_create_many(user.id, ['income', 'food', 'rent', 'travel'])
+        expense_categories = [category_ids[name] for name in ['food', 'rent', 'travel']]
+        Income.objects.bulk_create(
+            (Income(user=user, title='Salary', category_id=category_ids['income'], income=rng.randrange(100, 500000) / 100, date=day())
+             for _ in range(incomes)),
+            batch_size=5000,
+        )
+        Expense.objects.bulk_create(
+            (Expense(user=user, title='Spend', category_id=rng.choice(expense_categories),
+                     expense=rng.randrange(100, 50000) / 100, date=day())
+             for _ in range(size - incomes)),
+            batch_size=5000,
+        )
+        income_qs, expense_qs = entries.filter_entries(user.id)
+
+        started = time.perf_counter()
+        combined = []
+        for income in income_qs:
+            combined.append({'type': 'income', 'amount': float(income.income), 'date': income.date.isoformat()})
+        for expense in expense_qs:
+            combined.append({'type': 'expense', 'amount': float(expense.expense) * -1,
+                             'date': expense.date.isoformat()})
+        combined.sort(key=lambda x: x['date'])
+        python_sort = time.perf_counter() - started
+
+        started = time.perf_counter()
+        names = categories.names(user.id)
+        merged = [entries.entry_to_json(row, names) for row in entries.merged_entries(income_qs, expense_qs).iterator()]
+        union_all = time.perf_counter() - started
+
+        started = time.perf_counter()
+        page = [entries.entry_to_json(row, names) for row in entries.merged_entries(income_qs, expense_qs)[:page_size]]
+        first_page = time.perf_counter() - started
+
+        assert len(merged) == len(combined) == size and len(page) == min(size, page_size)
+        self.stdout.write(
+            f'{size:>9} rows  python sort {python_sort * 1000:9.1f} ms  '
+            f'union all {union_all * 1000:9.1f} ms  '
+            f'first {page_size} via union all {first_page * 1000:7.1f} ms'
+        )
@@ -0,0 +1,122 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.test.utils import CaptureQueriesContext
+
+from finances import categories, reports, rollups
+from finances.models import Income, Expense
+
+User = get_user_model()
+
+CATEGORIES = ['food', 'rent', 'travel', 'utilities', 'entertainment', 'health']
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_report(user_id, start_date=None, end_date=None, category=None):
+    """The original get_reports body: raw-table aggregates, one query per section."""
+    expense_qs = Expense.objects.filter(user_id=user_id)
+    if start_date and end_date:
+        expense_qs = expense_qs.filter(date__range=[start_date, end_date])
+    if category and category != 'all':
+        expense_qs = expense_qs.filter(category__name=category)
+    expense_categories = list(expense_qs.values('category').annotate(total=Sum('expense')).order_by('-total'))
+
+    monthly_expense_qs = Expense.objects.filter(user_id=user_id)
+    if start_date and end_date:
+        monthly_expense_qs = monthly_expense_qs.filter(date__range=[start_date, end_date])
+    if category and category != 'all':
+        monthly_expense_qs = monthly_expense_qs.filter(category__name=category)
+    six_months_ago = datetime.now() - timedelta(days=180)
+    monthly_data = list(monthly_expense_qs.filter(date__gte=six_months_ago).annotate(
+        month=TruncMonth('date')
+    ).values('month', 'category').annotate(total=Sum('expense')).order_by('month'))
+
+    income_qs = Income.objects.filter(user_id=user_id)
+    if start_date and end_date:
+        income_qs = income_qs.filter(date__range=[start_date, end_date])
+    if category and category != 'all':
+        income_qs = income_qs.filter(category__name=category)
+    total_income = income_qs.aggregate(total=Sum('income'))['total'] or 0
+    total_expenses = expense_qs.aggregate(total=Sum('expense'))['total'] or 0
+    overall_expense_categories = list(expense_qs.values('category').annotate(total=Sum('expense')).order_by('-total'))
+    return expense_categories, monthly_data, total_income, total_expenses, overall_expense_categories
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the original get_reports queries with the rollup-based report engine. '
+        'Rows are generated inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000])
+        parser.add_argument('--years', type=int, default=5, help='Span of generated history.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per scenario; the best time is reported.')
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.run(size, options['years'], options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, size, years, repeat):
+        user = User.objects.create(username='benchmark-reports', email='benchmark-reports@example.com')
+        rng = random.Random(size)
+        end = date.today()
+        days = 365 * years
+
+        def day():
+            return end - timedelta(days=rng.randrange(days))
+
+        incomes = size // 10
+        category_ids = categories.get_or_create_many(user.id, ['income', *CATEGORIES])
+        expense_categories = [category_ids[name] for name in CATEGORIES]
+        Income.objects.bulk_create(
+            (Income(user=user, title='Salary', category_id=category_ids['income'], income=rng.randrange(100000, 500000) / 100, date=day())
+             for _ in range(incomes)),
+            batch_size=5000,
+        )
+        Expense.objects.bulk_create(
+            (Expense(user=user, title='Spend', category_id=rng.choice(expense_categories),
+                     expense=rng.randrange(100, 50000) / 100, date=day())
+             for _ in range(size - incomes)),
+            batch_size=5000,
+        )
+        rollups.rebuild(user.id)
+
+        year_ago = (end - timedelta(days=365)).isoformat()
+        scenarios = {
+            'all time': {},
+            'last year': {'start_date': year_ago, 'end_date': end.isoformat()},
+            'last year, food': {'start_date': year_ago, 'end_date': end.isoformat(), 'category': 'food'},
+        }
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{size} rows over {years} years'))
+        for label, params in scenarios.items():
+            results = []
+            for implementation in (legacy_report, reports.build_report):
+                best = None
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        implementation(user.id, **params)
+                        elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                results.append((best, len(queries)))
+            (legacy, legacy_queries), (engine, engine_queries) = results
+            self.stdout.write(
+                f'  {label:<16} legacy {legacy * 1000:8.2f} ms / {legacy_queries} queries   '
+                f'engine {engine * 1000:8.2f} ms / {engine_queries} queries'
+            )
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from backend.performance import percentile
+from finances import seeding
+
+# Django's own SQLite behaviour: rollback journal, fsync on every commit and
+# deferred transactions
+DEFAULT_PROFILE = ({}, None)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent writer and reader threads against a file-backed test database, once with '
+        "Django's default SQLite settings and once with the SQLITE_PRAGMAS profile, and report "
+        'throughput, p95 latency and failed requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Threads posting expenses.')
+        parser.add_argument('--readers', type=int, default=4, help='Threads reading reports and pages.')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run.')
+        parser.add_argument('--rows', type=int, default=20_000, help='Rows seeded for the benchmark user.')
+
+    def handle(self, *args, **options):
+        options_dict = connections['default'].settings_dict['OPTIONS']
+        profiles = {
+            'default': DEFAULT_PROFILE,
+            'tuned': (settings.SQLITE_PRAGMAS, options_dict.get('transaction_mode')),
+        }
+
+        # fsync and locking only show up on a real file, not the usual in-memory test database
+        directory = tempfile.mkdtemp()
+        connections['default'].settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            with override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0, PERFORMANCE_SLOW_REQUEST_MS=float('inf')):
+                user, = seeding.create_users(1, prefix='benchmark-sqlite')
+                seeding.seed_user(user, options['rows'] // 10, options['rows'] - options['rows'] // 10, 120)
+                self.stdout.write(
+                    f'{"profile":<8} {"writes/s":>9} {"write p95":>10} {"reads/s":>9} {"read p95":>10} {"errors":>7}'
+                )
+                for name, (pragmas, transaction_mode) in profiles.items():
+                    options_dict['transaction_mode'] = transaction_mode
+                    with override_settings(SQLITE_PRAGMAS=pragmas):
+                        # journal_mode is stored in the database file; switch it once, before the threads start
+                        with connection.cursor() as cursor:
+                            cursor.execute(f"PRAGMA journal_mode = {pragmas.get('journal_mode', 'DELETE')}")
+                        connections.close_all()
+                        self.run(name, user, options)
+        finally:
+            connections.close_all()
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+    def run(self, name, user, options):
+        deadline = time.perf_counter() + options['seconds']
+        results = {'write': [], 'read': []}
+        errors = []
+        lock = threading.Lock()
+
+        def worker(kind, index):
+            client = Client(raise_request_exception=False)
+            timings, failed = [], 0
+            n = 0
+            try:
+                while time.perf_counter() < deadline:
+                    n += 1
+                    started = time.perf_counter()
+                    if kind == 'write':
+                        response = client.post(reverse('add-expense'), {
+                            'user_id': user.id, 'amount': '3.50', 'category': 'food',
+                            'date': date.today().isoformat(), 'title': f'Writer {index} #{n}',
+                        }, content_type='application/json')
+                    elif n % 2:
+                        response = client.get(reverse('get_reports', args=[user.id]))
+                    else:
+                        response = client.get(reverse('finance_details', args=[user.id]), {'order': 'desc'})
+                    timings.append(time.perf_counter() - started)
+                    failed += response.status_code >= 400
+            finally:
+                connections.close_all()
+            with lock:
+                results[kind].extend(timings)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=worker, args=('write', i)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=worker, args=('read', i)) for i in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        line = f'{name:<8}'
+        for kind in ('write', 'read'):
+            timings = sorted(results[kind])
+            p95 = percentile(timings, 0.95) * 1000 if timings else 0
+            line += f' {len(timings) / options["seconds"]:9.1f} {p95:8.1f}ms'
+        self.stdout.write(f'{line} {sum(errors):7d}')
@@ -0,0 +1,98 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from finances import analytics, categories, entries, rollups
+from finances.models import MonthlyBudget
+from finances.views import FINANCE_PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN QUERY PLAN and timings for the queries behind each finances endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('--start-date', default='2000-01-01')
+        parser.add_argument('--end-date', default=date.today().isoformat())
+        parser.add_argument('--category', default='food')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the best time is reported.')
+
+    def handle(self, *args, **options):
+        user_id = options['user_id']
+        start_date = options['start_date']
+        end_date = options['end_date']
+        category = categories.find(user_id, options['category'])
+        repeat = options['repeat']
+        if repeat < 1:
+            raise CommandError('--repeat must be at least 1.')
+
+        try:
+            start = date.fromisoformat(start_date)
+            end = date.fromisoformat(end_date)
+        except ValueError:
+            raise CommandError('--start-date and --end-date must be YYYY-MM-DD.')
+
+        incomes, expenses = entries.filter_entries(user_id, start_date, end_date)
+        category_incomes, category_expenses = entries.filter_entries(
+            user_id, start_date, end_date, options['category']
+        )
+        period_range = (MonthlyBudget.period_of(start), MonthlyBudget.period_of(end))
+
+        def totals(label, **kwargs):
+            """The rollup and partial-month queries behind one rollups.monthly_totals() call."""
+            return [
+                (f'{label}: {"rollup" if kind is None else f"raw {kind}"}', queryset)
+                for kind, queryset in rollups.monthly_totals_queries(user_id, start, end, **kwargs)
+            ]
+
+        # One entry per query the endpoint issues. Rollup and analytics reads come from the
+        # builders the views call; the budget GROUP BYs mirror views.py and budgets.py
+        endpoints = {
+            'finance_details': [
+                ('page', entries.merged_entries(incomes, expenses)[:FINANCE_PAGE_SIZE + 1]),
+                ('page by category', entries.merged_entries(
+                    category_incomes, category_expenses
+                )[:FINANCE_PAGE_SIZE + 1]),
+            ],
+            'budget_details': [
+                ('budgets', MonthlyBudget.objects.filter(user_id=user_id, category_id=category)),
+                ('budgets by month', MonthlyBudget.objects.filter(
+                    user_id=user_id, period=MonthlyBudget.period_of(start)
+                )),
+                ('budgets by date range', MonthlyBudget.objects.filter(user_id=user_id, period__range=period_range)),
+            ],
+            'BudgetCalculatorView': [
+                ('budget per category', MonthlyBudget.objects.filter(
+                    user_id=user_id, period__range=period_range
+                ).values('category').annotate(total=Sum('amount'))),
+                *totals('totals'),
+            ],
+            'get_reports': [
+                *totals('all categories'),
+                *totals('one category', category=category),
+            ],
+            'budget_trends': [
+                ('budget per month and category', MonthlyBudget.objects.filter(
+                    user_id=user_id, period__range=period_range
+                ).values('period', 'category').annotate(total=Sum('amount')).order_by()),
+                *totals('spending', kinds=(rollups.EXPENSE,)),
+            ],
+            'spending_analytics': [
+                ('daily totals', analytics.daily_totals(user_id)),
+            ],
+        }
+
+        for endpoint, queries in endpoints.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(endpoint))
+            for label, queryset in queries:
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    rows = len(list(queryset.all()))
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                self.stdout.write(f'  {label}: {rows} rows, {best * 1000:.2f} ms')
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finances import categories, entries
+
+
+class Command(BaseCommand):
+    help = "Stream a user's incomes and expenses as CSV or newline-delimited JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('--format', dest='export_format', choices=sorted(entries.EXPORT_FORMATS), default='csv')
+        parser.add_argument('--start-date')
+        parser.add_argument('--end-date')
+        parser.add_argument('--category')
+        parser.add_argument('--type', dest='entry_type', choices=['income', 'expense'], default='')
+        parser.add_argument('--output', help='File to write to; defaults to stdout.')
+
+    def handle(self, *args, **options):
+        if bool(options['start_date']) != bool(options['end_date']):
+            raise CommandError('--start-date and --end-date must be given together.')
+
+        incomes, expenses = entries.filter_entries(
+            options['user_id'], options['start_date'], options['end_date'], options['category']
+        )
+        rows = entries.merged_entries(incomes, expenses, options['entry_type'])
+        chunks = entries.export_lines(
+            rows.iterator(chunk_size=entries.EXPORT_CHUNK_SIZE), options['export_format'],
+            categories.names(options['user_id'])
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finances import importers
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import a CSV or OFX bank statement into a user\'s incomes and expenses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='statement_format', choices=importers.IMPORT_FORMATS,
+                            help='Defaults to the file extension.')
+        parser.add_argument('--date-format', help='strptime format of the CSV date column, e.g. %%d/%%m/%%Y.')
+        parser.add_argument('--chunk-size', type=int, default=importers.IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        statement_format = (options['statement_format'] or options['path'].rsplit('.', 1)[-1]).lower()
+        if statement_format not in importers.IMPORT_FORMATS:
+            raise CommandError('Pass --format csv or --format ofx.')
+
+        try:
+            user = User.objects.get(id=options['user_id'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user_id']} does not exist.")
+
+        with open(options['path'], encoding='utf-8-sig', errors='replace', newline='') as statement:
+            try:
+                rows = importers.read_statement(statement, statement_format, options['date_format'])
+                summary = importers.import_statement(user, rows, options['chunk_size'])
+            except importers.StatementError as e:
+                raise CommandError(str(e))
+
+        for error in summary['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary['created']}, skipped {summary['duplicates']} duplicates, {summary['failed']} failed."
+        ))
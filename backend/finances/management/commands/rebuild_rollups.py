@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from finances import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly income/expense rollup from the Income and Expense tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, dest='user_id', help='Only rebuild the rollup for this user id.')
+
+    def handle(self, *args, **options):
+        created = rollups.rebuild(options['user_id'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} rollup rows.'))
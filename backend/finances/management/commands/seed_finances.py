@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from finances import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate users with realistic incomes, expenses and monthly budgets. '
+        f'Every generated user can log in with the password "{seeding.SEED_PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Number of users to create.')
+        parser.add_argument('--incomes', type=int, default=100, help='Income rows per user.')
+        parser.add_argument('--expenses', type=int, default=900, help='Expense rows per user.')
+        parser.add_argument('--budgets', type=int, default=60, help='Monthly budget rows per user.')
+        parser.add_argument('--months', type=int, default=24, help='Months of history ending this month.')
+        parser.add_argument('--prefix', default='seed', help='Username and email prefix.')
+        parser.add_argument('--seed', type=int, help='Random seed; defaults to each user id.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = seeding.create_users(options['users'], options['prefix'])
+        for user in users:
+            seeding.seed_user(
+                user, options['incomes'], options['expenses'], options['budgets'],
+                months=options['months'], seed=options['seed']
+            )
+            self.stdout.write(f'  {user.email} (id {user.id})')
+
+        rows = len(users) * (options['incomes'] + options['expenses'] + options['budgets'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users and {rows} rows in {time.perf_counter() - started:.1f} s.'
+        ))
@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from backend.routers import REPLICA, SYNC_TABLE
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into the replica file with the SQLite online backup API. '
+        'With --interval, keep copying every that many seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Seconds between copies; copy once if omitted.')
+
+    def handle(self, *args, **options):
+        if REPLICA not in connections.settings:
+            raise CommandError(f'No {REPLICA!r} database is configured.')
+        primary, replica = connections['default'], connections[REPLICA]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('sync_replica only copies SQLite databases; use the database\'s own replication.')
+
+        while True:
+            started = time.perf_counter()
+            primary.ensure_connection()
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                # Pages are copied in one step, so readers see either the old or the new snapshot
+                primary.connection.backup(target)
+                # Marks the copy as usable (see backend.routers.replica_available)
+                with target:
+                    target.execute(f'CREATE TABLE IF NOT EXISTS {SYNC_TABLE} (synced_at REAL NOT NULL)')
+                    target.execute(f'DELETE FROM {SYNC_TABLE}')
+                    target.execute(f'INSERT INTO {SYNC_TABLE} (synced_at) VALUES (?)', [time.time()])
+            finally:
+                target.close()
+            self.stdout.write(f'Replica synced in {(time.perf_counter() - started) * 1000:.0f} ms.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+import finances.fields
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+# (model, field, max_digits, default)
+MONEY_FIELDS = [
+    ('income', 'income', 10, None),
+    ('expense', 'expense', 10, None),
+    ('monthlybudget', 'amount', 10, None),
+    ('monthlyrollup', 'total', 14, 0),
+]
+
+
+def decimals_to_cents(apps, schema_editor):
+    for model_name, field, _, _ in MONEY_FIELDS:
+        model = apps.get_model('finances', model_name)
+        model.objects.update(**{f'{field}_cents': Cast(Round(F(field) * 100), models.BigIntegerField())})
+
+
+def cents_to_decimals(apps, schema_editor):
+    for model_name, field, _, _ in MONEY_FIELDS:
+        model = apps.get_model('finances', model_name)
+        model.objects.update(**{field: F(f'{field}_cents') * Decimal('0.01')})
+
+
+def _decimal_field(max_digits, default, **kwargs):
+    if default is not None:
+        kwargs['default'] = default
+    return models.DecimalField(max_digits=max_digits, decimal_places=2, **kwargs)
+
+
+def _money_field(max_digits, default):
+    kwargs = {} if default is None else {'default': default}
+    return finances.fields.MoneyField(max_digits=max_digits, **kwargs)
+
+
+class Migration(migrations.Migration):
+    """
+    Store amounts as integer cents: copy each DecimalField into a temporary
+    integer column, drop the decimal column and rename the copy into place.
+    The decimal columns are made nullable before they are dropped so the
+    migration can be reversed on a populated database.
+    """
+
+    dependencies = [
+        ('finances', '0005_dataversion'),
+    ]
+
+    operations = [
+        *[
+            operation
+            for model_name, field, max_digits, default in MONEY_FIELDS
+            for operation in [
+                migrations.AddField(model_name, f'{field}_cents', models.BigIntegerField(default=0)),
+                migrations.AlterField(model_name, field, _decimal_field(max_digits, default, null=True)),
+            ]
+        ],
+        migrations.RunPython(decimals_to_cents, cents_to_decimals),
+        *[
+            operation
+            for model_name, field, max_digits, default in MONEY_FIELDS
+            for operation in [
+                migrations.RemoveField(model_name, field),
+                migrations.RenameField(model_name, f'{field}_cents', field),
+                migrations.AlterField(model_name, field, _money_field(max_digits, default)),
+            ]
+        ],
+    ]
@@ -0,0 +1,102 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# (model, related_name, on_delete)
+CATEGORY_FIELDS = [
+    ('income', 'incomes', django.db.models.deletion.PROTECT),
+    ('expense', 'expenses', django.db.models.deletion.PROTECT),
+    ('monthlybudget', 'monthly_budgets', django.db.models.deletion.PROTECT),
+    ('monthlyrollup', 'monthly_rollups', django.db.models.deletion.CASCADE),
+]
+
+# Indexes and constraints that include the category column, rebuilt on the new one
+INDEXES = [
+    ('income', models.Index(fields=['user', 'category', 'date'], name='income_user_cat_date_idx')),
+    ('expense', models.Index(fields=['user', 'category', 'date'], name='expense_user_cat_date_idx')),
+    ('monthlybudget', models.Index(fields=['user', 'year', 'month', 'category'], name='budget_user_period_cat_idx')),
+]
+ROLLUP_CONSTRAINT = models.UniqueConstraint(
+    fields=['user', 'month', 'kind', 'category'], name='rollup_user_month_kind_cat_uniq'
+)
+
+
+def names_to_categories(apps, schema_editor):
+    Category = apps.get_model('finances', 'Category')
+    pairs = set()
+    for model_name, _, _ in CATEGORY_FIELDS:
+        model = apps.get_model('finances', model_name)
+        pairs.update(model.objects.values_list('user_id', 'category').distinct().order_by())
+    Category.objects.bulk_create(
+        (Category(user_id=user_id, name=name) for user_id, name in pairs), batch_size=1000
+    )
+
+    category_id = Category.objects.filter(user_id=OuterRef('user_id'), name=OuterRef('category')).values('id')
+    for model_name, _, _ in CATEGORY_FIELDS:
+        apps.get_model('finances', model_name).objects.update(category_ref=Subquery(category_id))
+
+
+def categories_to_names(apps, schema_editor):
+    Category = apps.get_model('finances', 'Category')
+    name = Category.objects.filter(id=OuterRef('category_ref')).values('name')
+    for model_name, _, _ in CATEGORY_FIELDS:
+        apps.get_model('finances', model_name).objects.update(category=Subquery(name))
+
+
+class Migration(migrations.Migration):
+    """
+    Move category names into a per-user Category table: add a nullable
+    foreign key next to each category column, fill it from the distinct names,
+    then drop the text column and rename the key into place. As in 0006, the
+    text columns are made nullable first so the migration can be reversed on a
+    populated database.
+    """
+
+    dependencies = [
+        ('finances', '0006_money_cents'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'constraints': [models.UniqueConstraint(fields=('user', 'name'), name='category_user_name_uniq')],
+            },
+        ),
+        *[migrations.RemoveIndex(model_name, index.name) for model_name, index in INDEXES],
+        migrations.RemoveConstraint('monthlyrollup', ROLLUP_CONSTRAINT.name),
+        *[
+            operation
+            for model_name, _, _ in CATEGORY_FIELDS
+            for operation in [
+                migrations.AddField(
+                    model_name, 'category_ref',
+                    models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='finances.category'),
+                ),
+                migrations.AlterField(model_name, 'category', models.CharField(max_length=50, null=True)),
+            ]
+        ],
+        migrations.RunPython(names_to_categories, categories_to_names),
+        *[
+            operation
+            for model_name, related_name, on_delete in CATEGORY_FIELDS
+            for operation in [
+                migrations.RemoveField(model_name, 'category'),
+                migrations.RenameField(model_name, 'category_ref', 'category'),
+                migrations.AlterField(
+                    model_name, 'category',
+                    models.ForeignKey(on_delete=on_delete, related_name=related_name, to='finances.category'),
+                ),
+            ]
+        ],
+        *[migrations.AddIndex(model_name, index) for model_name, index in INDEXES],
+        migrations.AddConstraint('monthlyrollup', ROLLUP_CONSTRAINT),
+    ]
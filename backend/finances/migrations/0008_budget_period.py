@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0007_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='monthlybudget',
+            name='budget_user_period_cat_idx',
+        ),
+        migrations.AddField(
+            model_name='monthlybudget',
+            name='period',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('year'), '*', models.Value(100)), '+', django.db.models.functions.comparison.Cast('month', models.IntegerField())), output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='monthlybudget',
+            index=models.Index(fields=['user', 'period', 'category'], name='budget_user_yyyymm_cat_idx'),
+        ),
+    ]
@@ -1,13 +1,47 @@
 from django.db import models
+from django.db.models.functions import Cast
 from users.models import CustomUser
 
+from .fields import MoneyField
+
+
+class Category(models.Model):
+    # Entries, budgets and rollups point here, so they group and index on an integer id
+    # and renaming a category touches one row. Names are cached per user in finances.categories.
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='categories')
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        verbose_name_plural = 'categories'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='category_user_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.name}"
+
+
 class Income(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='incomes')
     title = models.CharField(max_length=100)  # Made required
     description = models.TextField(null=True, blank=True)  # New field: optional
-    category = models.CharField(max_length=50, default='income')
-    income = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='incomes')
+    income = MoneyField(max_digits=10)
     date = models.DateField()
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)  # Set by statement imports
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='income_user_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='income_user_cat_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'import_hash'],
+                condition=models.Q(import_hash__isnull=False),
+                name='income_user_import_hash_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}: {self.income} on {self.date}"
@@ -17,9 +51,24 @@ class Expense(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='expenses')
     title = models.CharField(max_length=100)  # Made required
     description = models.TextField(null=True, blank=True)  # New field: optional
-    category = models.CharField(max_length=50, default='expenses')
-    expense = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='expenses')
+    expense = MoneyField(max_digits=10)
     date = models.DateField()
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)  # Set by statement imports
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='expense_user_date_idx'),
+            # Covers the per-category daily sums in finances.analytics, so they never read the table
+            models.Index(fields=['user', 'category', 'date', 'expense'], name='expense_user_cat_date_amt_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'import_hash'],
+                condition=models.Q(import_hash__isnull=False),
+                name='expense_user_import_hash_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}: {self.expense} on {self.date}"
@@ -27,11 +76,57 @@ class Expense(models.Model):
 class MonthlyBudget(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_budgets')
     title = models.CharField(max_length=20)
-    category = models.CharField(max_length=50, default='expenses') 
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='monthly_budgets')
     month = models.CharField(max_length=7)  
     year = models.PositiveIntegerField()
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # yyyymm, kept in step with month and year by the database, so any range of months is one index range
+    period = models.GeneratedField(
+        expression=models.F('year') * 100 + Cast('month', models.IntegerField()),
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+    )
+    amount = MoneyField(max_digits=10)
     description = models.TextField(blank=True, null=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'period', 'category'], name='budget_user_yyyymm_cat_idx'),
+        ]
+
+    @staticmethod
+    def period_of(day):
+        """The period value (yyyymm) of the month containing a date."""
+        return day.year * 100 + day.month
+
     def __str__(self):
         return f"Budget for {self.month} {self.year} - {self.user}"
+
+
+class MonthlyRollup(models.Model):
+    INCOME = 'income'
+    EXPENSE = 'expense'
+    KIND_CHOICES = [(INCOME, 'Income'), (EXPENSE, 'Expense')]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_rollups')
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField()  # First day of the month
+    total = MoneyField(max_digits=14, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'kind', 'category'], name='rollup_user_month_kind_cat_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.kind} {self.category_id} {self.month:%Y-%m}: {self.total}"
+
+
+class DataVersion(models.Model):
+    # Bumped by every write to a user's finance data; cached reports are keyed on it
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='finance_version')
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - v{self.version}"
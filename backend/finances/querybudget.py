@@ -0,0 +1,92 @@
+"""
+Query-budget harness for API endpoint tests.
+
+QueryBudgetTestCase drives each URL of an app through its benchmark_endpoints
+scenario against users seeded with a small and a large data set. Every
+endpoint declares the most queries and the most rows its SELECTs may return;
+a test fails when an endpoint exceeds either, or when its query count changes
+between the two data sizes (the signature of an N+1 loop).
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+
+from backend.performance import observe_queries
+
+from . import seeding
+from .management.commands.benchmark_endpoints import SCENARIOS
+
+QueryBudget = namedtuple('QueryBudget', ['queries', 'rows'])
+QueryBudget.__doc__ = 'Most queries and most SELECTed rows for one request; rows=None when output grows with data.'
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = 0
+        self.selects = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            self.selects.append((sql, params))
+        return execute(sql, params, many, context)
+
+    def rows(self):
+        """Rows the recorded SELECTs return, counted by re-running them as COUNT(*) subqueries."""
+        total = 0
+        with connection.cursor() as cursor:
+            for sql, params in self.selects:
+                cursor.execute(f'SELECT COUNT(*) FROM ({sql})', params)
+                total += cursor.fetchone()[0]
+        return total
+
+
+# A fast hasher keeps the login and password endpoints from dominating the run
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    PERFORMANCE_LOG_SAMPLE_RATE=0,
+)
+class QueryBudgetTestCase(TransactionTestCase):
+    """
+    Subclasses set urlconf (the app's urls module) and budgets, mapping every
+    URL name in it to a QueryBudget.
+    """
+    urlconf = None
+    budgets = {}
+    sizes = (40, 400)
+
+    def measure(self, name, user):
+        client = Client()
+        client.force_login(user)
+        requests = SCENARIOS[name](client, user, 2)
+        # The first request warms per-user rows (rollup months, data version); measure the second, uncached
+        next(requests)()
+        cache.clear()
+        recorder = QueryRecorder()
+        with observe_queries(recorder):
+            response = next(requests)()
+        list(requests)
+        self.assertLess(response.status_code, 400, f'{name} returned {response.status_code}')
+        return recorder.queries, recorder.rows()
+
+    def test_every_url_has_a_budget(self):
+        self.assertEqual({pattern.name for pattern in self.urlconf.urlpatterns}, set(self.budgets))
+
+    def test_query_budgets(self):
+        users = []
+        for size in self.sizes:
+            user, = seeding.create_users(1, prefix=f'budget-{size}', staff=True)
+            seeding.seed_user(user, size // 10, size - size // 10, budgets=size // 20)
+            users.append(user)
+
+        for name, budget in self.budgets.items():
+            with self.subTest(name):
+                (small_queries, small_rows), (large_queries, large_rows) = [
+                    self.measure(name, user) for user in users
+                ]
+                self.assertEqual(small_queries, large_queries, f'{name}: query count grows with data size')
+                self.assertLessEqual(large_queries, budget.queries, f'{name}: too many queries')
+                if budget.rows is not None:
+                    self.assertLessEqual(max(small_rows, large_rows), budget.rows, f'{name}: too many rows fetched')
@@ -0,0 +1,81 @@
+"""
+Report engine behind get_reports.
+
+Every section of the report (totals, expense categories and the monthly
+income vs. expenses series) is folded out of a single rollups.monthly_totals()
+call in one pass.
+
+Query budget: one MonthlyRollup query for the whole months in the range, plus
+one raw GROUP BY query per table (Income, Expense) covering the partial months
+at either end of a date range. That is REPORT_QUERY_BUDGET queries in the
+worst case, and a single query when the range is unset or month-aligned.
+Category names come from the in-memory cache in finances.categories, which
+costs one more query when the user's categories are not cached.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from . import categories, rollups
+
+REPORT_QUERY_BUDGET = 3
+MONTHLY_WINDOW_DAYS = 180
+
+
+def monthly_window_start(today=None):
+    """First day of the month containing the date MONTHLY_WINDOW_DAYS ago."""
+    today = today or timezone.localdate()
+    return (today - timedelta(days=MONTHLY_WINDOW_DAYS)).replace(day=1)
+
+
+def build_report(user_id, start_date=None, end_date=None, category=None, today=None):
+    """
+    Return the get_reports payload for a user. start_date and end_date are
+    ISO strings or dates and only apply when both are given; category is a
+    category name, None meaning all categories.
+    """
+    if not (start_date and end_date):
+        start_date = end_date = None
+    if category is not None:
+        category = categories.find(user_id, category)
+    window_start = monthly_window_start(today)
+
+    total_income = 0
+    total_expenses = 0
+    category_totals = {}
+    months = {}
+
+    for row in rollups.monthly_totals(user_id, start_date, end_date, category):
+        is_income = row['kind'] == rollups.INCOME
+        if is_income:
+            total_income += row['total']
+        else:
+            total_expenses += row['total']
+            category_totals[row['category']] = category_totals.get(row['category'], 0) + row['total']
+
+        if row['month'] >= window_start:
+            month = months.setdefault(row['month'], {'income': 0, 'expenses': 0})
+            month['income' if is_income else 'expenses'] += row['total']
+
+    names = categories.names(user_id)
+    expense_categories = sorted(
+        ({'category': names[category_id], 'total': total} for category_id, total in category_totals.items()),
+        key=lambda item: item['total'],
+        reverse=True
+    )
+    monthly_data = [
+        {'month': month.strftime('%B %Y'), 'income': values['income'], 'expenses': values['expenses']}
+        for month, values in sorted(months.items())
+    ]
+
+    return {
+        'expense_categories': expense_categories,
+        'monthly_data': monthly_data,
+        'total_income': float(total_income),
+        'total_expenses': float(total_expenses),
+        'overall_income_vs_expenses': {
+            'income': float(total_income),
+            'expenses': float(total_expenses)
+        },
+        'overall_expense_categories': expense_categories
+    }
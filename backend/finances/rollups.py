@@ -0,0 +1,181 @@
+"""
+Per-user monthly rollups of incomes and expenses.
+
+Every view that writes Income or Expense rows reports the change here, so
+MonthlyRollup always holds the sum and count per (user, kind, category, month).
+Reports then read one row per month and category instead of every transaction;
+only months that a date range cuts through are aggregated from the raw tables.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .fields import from_cents
+from .models import Income, Expense, MonthlyRollup
+
+INCOME = MonthlyRollup.INCOME
+EXPENSE = MonthlyRollup.EXPENSE
+
+# kind -> (model, amount field)
+SOURCES = {
+    INCOME: (Income, 'income'),
+    EXPENSE: (Expense, 'expense'),
+}
+
+
+def kind_of(entry):
+    return INCOME if isinstance(entry, Income) else EXPENSE
+
+
+def contribution(entry):
+    """Return the (rollup key, amount in cents) an Income or Expense adds to the rollup."""
+    kind = kind_of(entry)
+    model, amount_field = SOURCES[kind]
+    # Views pass request values straight into the model, so normalise them here
+    day = model._meta.get_field('date').to_python(entry.date)
+    cents = model._meta.get_field(amount_field).get_prep_value(getattr(entry, amount_field))
+    return (kind, entry.user_id, entry.category_id, day.replace(day=1)), cents
+
+
+def apply(added=(), removed=()):
+    """Add and subtract contributions (as returned by contribution()) from the rollup."""
+    deltas = defaultdict(lambda: [0, 0])
+    for key, cents in added:
+        deltas[key][0] += cents
+        deltas[key][1] += 1
+    for key, cents in removed:
+        deltas[key][0] -= cents
+        deltas[key][1] -= 1
+
+    for (kind, user_id, category, month), (cents, count) in deltas.items():
+        if not cents and not count:
+            continue
+        rows = MonthlyRollup.objects.filter(user_id=user_id, kind=kind, category_id=category, month=month)
+        if rows.update(total=F('total') + cents, count=F('count') + count):
+            if count < 0:
+                rows.filter(count=0).delete()
+            continue
+        try:
+            with transaction.atomic():
+                MonthlyRollup.objects.create(
+                    user_id=user_id, kind=kind, category_id=category, month=month, total=from_cents(cents), count=count
+                )
+        except IntegrityError:
+            # Another request created the row first
+            rows.update(total=F('total') + cents, count=F('count') + count)
+
+
+def entries_added(entries):
+    apply(added=[contribution(entry) for entry in entries])
+
+
+def entries_removed(entries):
+    apply(removed=[contribution(entry) for entry in entries])
+
+
+def rebuild(user_id=None):
+    """Recompute the rollup from the raw tables, for one user or everyone."""
+    rollups = MonthlyRollup.objects.all()
+    if user_id is not None:
+        rollups = rollups.filter(user_id=user_id)
+
+    with transaction.atomic():
+        rollups.delete()
+        created = 0
+        for kind, (model, amount_field) in SOURCES.items():
+            entries = model.objects.all()
+            if user_id is not None:
+                entries = entries.filter(user_id=user_id)
+            rows = entries.annotate(month=TruncMonth('date')).values('user_id', 'category_id', 'month').annotate(
+                total=Sum(amount_field), count=Count('id')
+            ).order_by()
+            objs = MonthlyRollup.objects.bulk_create(
+                MonthlyRollup(kind=kind, **row) for row in rows.iterator()
+            )
+            created += len(objs)
+    return created
+
+
+def _to_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def monthly_totals_queries(user_id, start=None, end=None, category=None, kinds=(INCOME, EXPENSE)):
+    """
+    Return the (kind, queryset) pairs monthly_totals() reads: the MonthlyRollup
+    query for the whole months in the range (kind None, as its rows carry their
+    kind), and one raw GROUP BY per kind for the partial months at either end.
+    """
+    start = _to_date(start)
+    end = _to_date(end)
+
+    first_full = start if start is None or start.day == 1 else _next_month(start)
+    after_full = None if end is None else _next_month(end)
+    if end is not None and after_full - timedelta(days=1) != end:
+        after_full = end.replace(day=1)
+
+    if first_full is not None and after_full is not None and first_full >= after_full:
+        # No whole month inside the range
+        rollup_range = None
+        raw_ranges = [(start, end)]
+    else:
+        rollup_range = (first_full, after_full)
+        raw_ranges = []
+        if start is not None and start != first_full:
+            raw_ranges.append((start, first_full - timedelta(days=1)))
+        if end is not None and after_full <= end:
+            raw_ranges.append((after_full, end))
+
+    queries = []
+    if rollup_range is not None:
+        rollups = MonthlyRollup.objects.filter(user_id=user_id, kind__in=kinds)
+        if first_full is not None:
+            rollups = rollups.filter(month__gte=first_full)
+        if after_full is not None:
+            rollups = rollups.filter(month__lt=after_full)
+        if category is not None:
+            rollups = rollups.filter(category_id=category)
+        queries.append((None, rollups.values('kind', 'month', 'category', 'total', 'count')))
+
+    if raw_ranges:
+        date_filter = Q()
+        for range_start, range_end in raw_ranges:
+            date_filter |= Q(date__range=[range_start, range_end])
+        for kind in kinds:
+            model, amount_field = SOURCES[kind]
+            entries = model.objects.filter(date_filter, user_id=user_id)
+            if category is not None:
+                entries = entries.filter(category_id=category)
+            queries.append((kind, entries.annotate(month=TruncMonth('date')).values('month', 'category').annotate(
+                total=Sum(amount_field), count=Count('id')
+            ).order_by()))
+    return queries
+
+
+def monthly_totals(user_id, start=None, end=None, category=None, kinds=(INCOME, EXPENSE)):
+    """
+    Return rows of {'kind', 'month', 'category', 'total', 'count'} for entries
+    dated between start and end (inclusive, either may be None). Categories
+    are ids, both in the rows and in the category filter.
+
+    Whole months come from MonthlyRollup; the partial months at either end of
+    the range are aggregated from Income/Expense directly.
+    """
+    rows = []
+    for kind, queryset in monthly_totals_queries(user_id, start, end, category, kinds):
+        for row in queryset:
+            if kind is not None:
+                row['kind'] = kind
+            rows.append(row)
+
+    rows.sort(key=lambda row: (row['month'], row['category']))
+    return rows
@@ -0,0 +1,145 @@
+"""
+Synthetic finance data for benchmarks and scaling tests.
+
+Generated users get a steady salary with occasional side income, expenses
+spread over weighted categories with log-normal amounts (rent once a month,
+groceries and transport most days, travel rarely), and monthly budgets for
+their biggest categories. Rows are written with bulk_create and the user's
+rollup is rebuilt afterwards.
+"""
+import math
+import random
+from datetime import date, timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import Income, Expense, MonthlyBudget
+from . import caching, categories, rollups
+
+User = get_user_model()
+
+SEED_PASSWORD = 'seed-pass-123'
+SEED_BATCH_SIZE = 5000
+
+# category: (share of expense rows, median amount, spread of log(amount))
+EXPENSE_CATEGORIES = {
+    'food': (0.32, 18, 0.7),
+    'transport': (0.16, 12, 0.6),
+    'shopping': (0.12, 45, 0.9),
+    'entertainment': (0.10, 30, 0.8),
+    'utilities': (0.07, 80, 0.4),
+    'health': (0.05, 60, 0.9),
+    'education': (0.03, 120, 0.7),
+    'travel': (0.03, 350, 0.8),
+    'rent': (0.02, 1400, 0.2),
+    'other': (0.10, 25, 1.0),
+}
+
+# title: (share of income rows, median amount, spread of log(amount))
+INCOME_SOURCES = {
+    'Salary': (0.70, 2500, 0.15),
+    'Freelance': (0.15, 400, 0.8),
+    'Interest': (0.10, 15, 0.6),
+    'Gift': (0.05, 100, 0.7),
+}
+
+
+def _amount(rng, median, spread):
+    return round(min(rng.lognormvariate(math.log(median), spread), 99_999_999), 2)
+
+
+def _months_back(end, months):
+    year, month = end.year, end.month - months + 1
+    while month < 1:
+        year, month = year - 1, month + 12
+    return date(year, month, 1)
+
+
+def _bulk_create(model, rows):
+    # Chunk here rather than via batch_size, which would materialize every row first
+    while True:
+        chunk = list(islice(rows, SEED_BATCH_SIZE))
+        if not chunk:
+            return
+        model.objects.bulk_create(chunk)
+
+
+def create_users(count, prefix='seed', staff=False):
+    """Create count users sharing SEED_PASSWORD (hashed once), returning them."""
+    password = make_password(SEED_PASSWORD)
+    start = User.objects.filter(username__startswith=f'{prefix}-').count()
+    users = [
+        User(username=f'{prefix}-{n}', email=f'{prefix}-{n}@example.com', password=password, is_staff=staff)
+        for n in range(start, start + count)
+    ]
+    User.objects.bulk_create(users)
+    return list(User.objects.filter(email__in=[user.email for user in users]).order_by('id'))
+
+
+def seed_user(user, incomes, expenses, budgets, months=24, end=None, seed=None):
+    """
+    Generate incomes, expenses and monthly budget rows for a user over the
+    months up to end (default today).
+    """
+    rng = random.Random(user.id if seed is None else seed)
+    end = end or date.today()
+    start = _months_back(end, months)
+    span = (end - start).days + 1
+
+    def weighted(table):
+        names = list(table)
+        return names, [table[name][0] for name in names]
+
+    def day():
+        return start + timedelta(days=rng.randrange(span))
+
+    income_names, income_weights = weighted(INCOME_SOURCES)
+    expense_names, expense_weights = weighted(EXPENSE_CATEGORIES)
+    category_ids = categories.get_or_create_many(user.id, [categories.DEFAULT_INCOME, *expense_names])
+
+    def income_rows():
+        for title in rng.choices(income_names, income_weights, k=incomes):
+            _, median, spread = INCOME_SOURCES[title]
+            posted = day()
+            if title == 'Salary':
+                posted = posted.replace(day=1 if posted.day < 15 else 15)
+            yield Income(
+                user=user, title=title, category_id=category_ids[categories.DEFAULT_INCOME],
+                income=_amount(rng, median, spread), date=posted
+            )
+
+    def expense_rows():
+        for category in rng.choices(expense_names, expense_weights, k=expenses):
+            _, median, spread = EXPENSE_CATEGORIES[category]
+            posted = day()
+            if category == 'rent':
+                posted = posted.replace(day=1)
+            yield Expense(
+                user=user, title=category.capitalize(), category_id=category_ids[category],
+                expense=_amount(rng, median, spread), date=posted
+            )
+
+    # Budgets go to the most recent months first, largest categories first within a month
+    periods = [_months_back(end, n + 1) for n in range(months)]
+    by_spend = sorted(expense_names, key=lambda name: -EXPENSE_CATEGORIES[name][0] * EXPENSE_CATEGORIES[name][1])
+    slots = [(period, category) for period in periods for category in by_spend][:budgets]
+
+    def budget_rows():
+        for period, category in slots:
+            share, median, _ = EXPENSE_CATEGORIES[category]
+            monthly = median * share * expenses / months
+            yield MonthlyBudget(
+                user=user, title=category.capitalize()[:20], category_id=category_ids[category],
+                month=str(period.month).zfill(2), year=period.year,
+                amount=round(max(monthly, median) * rng.uniform(0.9, 1.3), 2)
+            )
+
+    with transaction.atomic():
+        _bulk_create(Income, income_rows())
+        _bulk_create(Expense, expense_rows())
+        _bulk_create(MonthlyBudget, budget_rows())
+        rollups.rebuild(user.id)
+        caching.bump_version(user.id)
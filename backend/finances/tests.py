@@ -1,3 +1,984 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from backend import performance, routers
+from users import urls as user_urls
+
+from .models import Income, Expense, MonthlyBudget, MonthlyRollup
+from . import analytics, budgets, caching, categories, entries, importers, querybudget, reports, rollups, seeding, views
+from . import urls as finance_urls
+from .management.commands.benchmark_endpoints import SCENARIOS
+from .querybudget import QueryBudget
+from .views import FINANCE_PAGE_SIZE
+
+User = get_user_model()
+
+
+class FinanceTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='secret-pass-123')
+
+    def add_budget(self, category, amount, month='03', year=2025):
+        return MonthlyBudget.objects.create(
+            user=self.user, title=category[:20], category_id=categories.get_or_create(self.user.id, category), month=month, year=year, amount=amount
+        )
+
+    def add_income(self, amount, day, category='income', month=3):
+        income = Income.objects.create(
+            user=self.user, title='Salary', category_id=categories.get_or_create(self.user.id, category), income=amount, date=date(2025, month, day)
+        )
+        rollups.entries_added([income])
+        return income
+
+    def add_expense(self, amount, day, category='expenses', month=3):
+        expense = Expense.objects.create(
+            user=self.user, title='Spend', category_id=categories.get_or_create(self.user.id, category), expense=amount, date=date(2025, month, day)
+        )
+        rollups.entries_added([expense])
+        return expense
+
+
+class BudgetCalculatorViewTests(FinanceTestCase):
+    url = '/api/finances/budget/'
+
+    def post_budget(self):
+        return self.client.post(self.url, {
+            'user_id': self.user.id,
+            'start_date': '2025-03-01',
+            'end_date': '2025-03-31',
+        }, content_type='application/json')
+
+    def test_budget_vs_actual(self):
+        self.add_budget('food', Decimal('100.00'))
+        self.add_budget('food', Decimal('50.00'))
+        self.add_budget('rent', Decimal('1000.00'))
+        self.add_budget('fun', Decimal('200.00'))
+        self.add_expense(Decimal('160.00'), 2, 'food')
+        self.add_expense(Decimal('850.00'), 3, 'rent')
+        self.add_expense(Decimal('25.00'), 4, 'travel')
+        self.add_income(Decimal('3000.00'), 1)
+
+        response = self.post_budget()
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_income'], 3000.0)
+        self.assertEqual(data['total_expense'], 1035.0)
+        self.assertEqual(data['budget'], 1965.0)
+        self.assertEqual(data['category_budgets'], {'food': 150.0, 'rent': 1000.0, 'fun': 200.0})
+        self.assertEqual(data['category_expenses'], {'food': 160.0, 'rent': 850.0, 'fun': 0.0})
+        self.assertEqual(set(data['category_alerts']), {'food', 'rent'})
+        self.assertEqual(data['category_alerts']['food']['status'], 'exceeded')
+        self.assertEqual(data['category_alerts']['food']['remaining'], -10.0)
+        self.assertEqual(data['category_alerts']['rent']['status'], 'warning')
+
+    def test_query_count_does_not_grow_with_categories(self):
+        for i in range(30):
+            self.add_budget(f'category-{i}', Decimal('100.00'))
+            self.add_expense(Decimal('10.00'), 1 + i % 28, f'category-{i}')
+
+        # user lookup, data version, budgets by category, income/expense rollup for the month, category
+        # names (which are only cached once committed, so never inside a test transaction)
+        with self.assertNumQueries(5):
+            response = self.post_budget()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['category_budgets']), 30)
+
+        # Served from the cache: user lookup and data version only
+        with self.assertNumQueries(2):
+            self.assertEqual(self.post_budget().json(), response.json())
+
+    def test_budgets_for_a_date_range(self):
+        self.add_budget('food', Decimal('100.00'), month='12', year=2024)
+        self.add_budget('food', Decimal('100.00'), month='01')
+        self.add_budget('food', Decimal('120.00'), month='03')
+        self.add_budget('food', Decimal('500.00'), month='04')
+        self.add_expense(Decimal('90.00'), 5, 'food', month=2)
+
+        response = self.client.post(self.url, {
+            'user_id': self.user.id, 'start_date': '2025-01-01', 'end_date': '2025-03-31',
+        }, content_type='application/json')
+
+        self.assertEqual(response.json()['category_budgets'], {'food': 220.0})
+        self.assertEqual(response.json()['category_expenses'], {'food': 90.0})
+
+    def test_budget_details_periods(self):
+        self.add_budget('food', Decimal('100.00'), month='02')
+        self.add_budget('rent', Decimal('900.00'), month='03')
+        self.add_budget('rent', Decimal('900.00'), month='06')
+        url = f'/api/finances/{self.user.id}/budget/'
+
+        def categories_for(**params):
+            return sorted(budget['category'] for budget in self.client.get(url, params).json()['budget'])
+
+        self.assertEqual(categories_for(month_year='3-2025'), ['rent'])
+        self.assertEqual(categories_for(start_date='2025-02-15', end_date='2025-04-01'), ['food', 'rent'])
+        self.assertEqual(MonthlyBudget.objects.get(month='06').period, 202506)
+
+
+class BudgetTrendsTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/finances/{self.user.id}/budget/trends/'
+
+    def test_budget_vs_actual_per_month(self):
+        self.add_budget('food', Decimal('100.00'), month='01')
+        self.add_budget('food', Decimal('100.00'), month='02')
+        self.add_budget('rent', Decimal('1000.00'), month='02')
+        self.add_expense(Decimal('85.00'), 10, 'food', month=1)
+        self.add_expense(Decimal('120.00'), 10, 'food', month=2)
+        self.add_expense(Decimal('40.00'), 20, 'fun', month=2)
+
+        response = self.client.get(self.url, {'start_date': '2025-01-01', 'end_date': '2025-03-31'})
+
+        self.assertEqual(response.status_code, 200)
+        months = response.json()['months']
+        self.assertEqual([month['month'] for month in months], ['2025-01', '2025-02', '2025-03'])
+        self.assertEqual(months[0]['categories'], [{
+            'category': 'food', 'budget': 100.0, 'actual': 85.0, 'remaining': 15.0, 'percentage': 85.0, 'status': 'warning',
+        }])
+        february = {cell['category']: cell for cell in months[1]['categories']}
+        self.assertEqual(february['food']['status'], 'exceeded')
+        self.assertEqual(february['food']['remaining'], -20.0)
+        self.assertEqual(february['rent']['status'], 'ok')
+        self.assertEqual(february['rent']['actual'], 0.0)
+        self.assertEqual(february['fun']['status'], 'unbudgeted')
+        self.assertIsNone(february['fun']['percentage'])
+        self.assertEqual((months[1]['budget'], months[1]['actual'], months[1]['remaining']), (1100.0, 160.0, 940.0))
+        self.assertEqual(months[2], {'month': '2025-03', 'budget': 0.0, 'actual': 0.0, 'remaining': 0.0, 'categories': []})
+
+    def test_default_and_invalid_ranges(self):
+        self.assertEqual(len(self.client.get(self.url).json()['months']), budgets.DEFAULT_MONTHS)
+        self.assertEqual(self.client.get(self.url, {'start_date': '2025-03-01', 'end_date': '2025-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start_date': '1900-01-01', 'end_date': '2025-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start_date': 'March'}).status_code, 400)
+
+
+class SpendingAnalyticsTests(FinanceTestCase):
+    today = date(2025, 6, 10)
+
+    def test_statistics(self):
+        for month, amount in [(1, '100.00'), (2, '200.00'), (3, '300.00'), (4, '600.00'), (5, '400.00')]:
+            self.add_expense(Decimal(amount), 5, 'food', month=month)
+        self.add_expense(Decimal('50.00'), 2, 'rent', month=5)
+        self.add_expense(Decimal('30.00'), 1, 'food', month=6)
+        self.add_expense(Decimal('15.00'), 9, 'food', month=6)
+
+        result = analytics.spending_analytics(self.user.id, self.today, months=4)
+
+        self.assertEqual(result['months'], ['2025-02', '2025-03', '2025-04', '2025-05'])
+        food, rent = result['categories']
+        self.assertEqual(food['category'], 'food')
+        self.assertEqual(food['monthly'], [200.0, 300.0, 600.0, 400.0])
+        self.assertEqual(food['rolling_mean'], [None, 200.0, 366.67, 433.33])
+        self.assertEqual(food['month_over_month'], [100.0, 100.0, 300.0, -200.0])
+        self.assertEqual(food['percentiles']['p50'], 300.0)
+        self.assertEqual(food['month_to_date'], 45.0)
+        # 45.00 so far plus 20 more days at the rate of the last 90 days (1045.00 / 90)
+        self.assertEqual(food['projected'], round(45 + 1045 / 90 * 20, 2))
+        self.assertEqual(rent['monthly'], [0.0, 0.0, 0.0, 50.0])
+        self.assertEqual(result['total']['monthly'], [200.0, 300.0, 600.0, 450.0])
+        self.assertEqual(result['total']['month_to_date'], 45.0)
+
+    def test_no_history(self):
+        result = analytics.spending_analytics(self.user.id, self.today)
+        self.assertEqual((result['months'], result['categories']), ([], []))
+        self.assertEqual(result['total']['projected'], 0.0)
+
+    def test_endpoint_is_cached_per_data_version(self):
+        self.add_expense(Decimal('10.00'), 5, 'food')
+        url = f'/api/finances/{self.user.id}/analytics/'
+        first = self.client.get(url, {'months': 6})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.json()['months']), 6)
+        self.assertEqual(self.client.get(url, {'months': 6}).json(), first.json())
+
+        self.client.post('/api/finances/add-expense/', {
+            'user_id': self.user.id, 'amount': '5.00', 'category': 'food', 'date': date.today().isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(self.client.get(url, {'months': 6}).json()['total']['month_to_date'], 5.0)
+
+
+class MonthlyRollupTests(FinanceTestCase):
+    def rollup(self, kind, category, month=date(2025, 3, 1)):
+        row = MonthlyRollup.objects.filter(user=self.user, kind=kind, category__name=category, month=month).first()
+        return (row.total, row.count) if row else None
+
+    def test_views_keep_rollup_in_sync(self):
+        response = self.client.post('/api/finances/add-expense/', {
+            'user_id': self.user.id, 'amount': '12.50', 'category': 'food', 'date': '2025-03-04',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        expense_id = response.json()['expense_id']
+        self.client.post('/api/finances/add-expense/', {
+            'user_id': self.user.id, 'amount': '7.50', 'category': 'food', 'date': '2025-03-09',
+        }, content_type='application/json')
+        self.assertEqual(self.rollup('expense', 'food'), (Decimal('20.00'), 2))
+
+        self.client.patch(f'/api/finances/update/{self.user.id}/{expense_id}/', {
+            'type': 'expense', 'category': 'rent', 'amount': '30.00',
+        }, content_type='application/json')
+        self.assertEqual(self.rollup('expense', 'food'), (Decimal('7.50'), 1))
+        self.assertEqual(self.rollup('expense', 'rent'), (Decimal('30.00'), 1))
+
+        self.client.delete(f'/api/finances/delete/{self.user.id}/{expense_id}/', {
+            'type': 'expense',
+        }, content_type='application/json')
+        self.assertIsNone(self.rollup('expense', 'rent'))
+
+        self.client.post('/api/finances/add-income/', {
+            'user_id': self.user.id, 'amount': '100', 'date': '2025-03-01',
+        }, content_type='application/json')
+        self.assertEqual(self.rollup('income', 'income'), (Decimal('100.00'), 1))
+
+    def test_monthly_totals_combines_rollup_and_partial_months(self):
+        self.add_expense(Decimal('1.00'), 10, 'food', month=1)
+        self.add_expense(Decimal('2.00'), 20, 'food', month=1)
+        self.add_expense(Decimal('4.00'), 5, 'food', month=2)
+        self.add_expense(Decimal('8.00'), 1, 'food', month=3)
+        self.add_expense(Decimal('16.00'), 30, 'food', month=3)
+
+        def total(start, end):
+            return sum(row['total'] for row in rollups.monthly_totals(self.user.id, start, end))
+
+        self.assertEqual(total(None, None), Decimal('31.00'))
+        self.assertEqual(total('2025-01-15', '2025-03-15'), Decimal('14.00'))
+        self.assertEqual(total('2025-02-01', '2025-02-28'), Decimal('4.00'))
+        self.assertEqual(total('2025-03-02', '2025-03-30'), Decimal('16.00'))
+        self.assertEqual(total('2025-01-11', None), Decimal('30.00'))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.add_expense(Decimal('5.00'), 3, 'food')
+        self.add_expense(Decimal('6.00'), 4, 'rent', month=4)
+        self.add_income(Decimal('9.00'), 5)
+        expected = set(MonthlyRollup.objects.values_list('kind', 'category', 'month', 'total', 'count'))
+
+        self.assertEqual(rollups.rebuild(), 3)
+        self.assertEqual(set(MonthlyRollup.objects.values_list('kind', 'category', 'month', 'total', 'count')), expected)
+
+
+class FinanceDetailsPaginationTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 11):
+            self.add_income(Decimal('100.00'), day)
+            self.add_expense(Decimal('10.00'), day, 'food')
+            self.add_expense(Decimal('20.00'), day, 'rent')
+        self.url = f'/api/finances/{self.user.id}/finance-details/'
+
+    def walk(self, **params):
+        entries, cursor, pages = [], None, 0
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            data = self.client.get(self.url, query).json()
+            entries.extend(data['finance'])
+            pages += 1
+            cursor = data['next']
+            if cursor is None:
+                return entries, pages
+
+    def test_pages_cover_every_entry_in_key_order(self):
+        entries, pages = self.walk(limit=7)
+        keys = [(e['date'], e['type'], e['id']) for e in entries]
+
+        self.assertEqual(pages, 5)
+        self.assertEqual(len(keys), 30)
+        self.assertEqual(keys, sorted(keys))
+
+        descending, _ = self.walk(limit=4, order='desc')
+        self.assertEqual(descending, entries[::-1])
+
+    def test_filters_apply_to_pages(self):
+        entries, _ = self.walk(limit=3, type='expense', category='rent')
+        self.assertEqual(len(entries), 10)
+        self.assertTrue(all(e['category'] == 'rent' and e['amount'] == -20.0 for e in entries))
+
+    def test_page_cost_is_constant(self):
+        first = self.client.get(self.url, {'limit': 5}).json()
+        # ETag data version lookup, the uncached category names, then the page itself
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'limit': 5, 'cursor': first['next']})
+
+    def test_cursor_seeks_the_date_index(self):
+        cursor = (date(2025, 1, 5), 'expense', 7)
+        for descending, bound in [(False, 'date>?'), (True, 'date<?')]:
+            plan = entries.after_cursor(
+                Expense.objects.filter(user_id=self.user.id), 'expense', cursor, descending
+            ).explain()
+            self.assertIn(f'expense_user_date_idx (user_id=? AND {bound})', plan)
+
+    def test_unpaginated_and_invalid_cursor(self):
+        data = self.client.get(self.url, {'paginate': 'false'}).json()
+        self.assertEqual(len(data['finance']), 30)
+        self.assertNotIn('next', data)
+
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 6):
+            self.add_income(Decimal('100.00'), day)
+            self.add_expense(Decimal('12.50'), day, 'food')
+        self.url = f'/api/finances/{self.user.id}/export/'
+
+    def test_csv_export_streams_filtered_rows(self):
+        response = self.client.get(self.url, {'type': 'expense'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,type,category,amount,title,description,date')
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].endswith(',expense,food,-12.5,Spend,,2025-03-01'))
+
+    def test_ndjson_export_matches_finance_details(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        exported = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        details = self.client.get(f'/api/finances/{self.user.id}/finance-details/', {'paginate': 'false'}).json()
+        self.assertEqual(exported, details['finance'])
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+
+
+class BatchEntriesViewTests(FinanceTestCase):
+    url = '/api/finances/add-batch/'
+
+    def post_batch(self, rows):
+        return self.client.post(self.url, {'user_id': self.user.id, 'entries': rows}, content_type='application/json')
+
+    def test_valid_and_invalid_rows_are_reported_per_row(self):
+        response = self.post_batch([
+            {'type': 'income', 'amount': '1000.00', 'date': '2025-03-01', 'title': 'Salary'},
+            {'type': 'expense', 'amount': '12.30', 'date': '2025-03-02', 'category': 'food'},
+            {'type': 'expense', 'amount': 'lots', 'date': '2025-03-02'},
+            {'type': 'gift', 'amount': '5', 'date': '2025-03-02'},
+            {'type': 'expense', 'date': '2025-03-02'},
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (2, 3))
+        self.assertEqual([r['status'] for r in data['results']], ['created', 'created', 'error', 'error', 'error'])
+        self.assertEqual(Income.objects.get(id=data['results'][0]['id']).income, Decimal('1000.00'))
+        self.assertEqual(Expense.objects.get(id=data['results'][1]['id']).category.name, 'food')
+        self.assertEqual(
+            MonthlyRollup.objects.get(user=self.user, kind='expense', category__name='food').total, Decimal('12.30')
+        )
+
+    def test_values_of_the_wrong_type_are_row_errors(self):
+        response = self.post_batch([
+            {'type': 'expense', 'amount': '12.30', 'date': '2025-03-02'},
+            {'type': 'expense', 'amount': '12.30', 'date': 20250302},
+            {'type': 'expense', 'amount': '12.30', 'date': ['2025-03-02']},
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'error', 'error'])
+        self.assertTrue(results[1]['errors'][0].startswith('date:'))
+
+    def test_failed_batches_write_nothing(self):
+        version = caching.data_version(self.user.id)
+        response = self.post_batch([{'type': 'expense', 'amount': 'lots', 'date': '2025-03-02', 'category': 'food'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(caching.data_version(self.user.id), version)
+
+        with mock.patch.object(Expense.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            response = self.post_batch([{'type': 'expense', 'amount': '1.00', 'date': '2025-03-02', 'category': 'fun'}])
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(self.user.categories.filter(name='fun').exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def queries_for(count):
+            rows = [{'type': 'expense', 'amount': '1.00', 'date': '2025-03-05', 'category': 'food'}] * count
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post_batch(rows).status_code, 201)
+            return len(queries)
+
+        # The first batch creates the rollup and data version rows
+        queries_for(1)
+        self.assertEqual(queries_for(10), queries_for(100))
+        self.assertEqual(Expense.objects.count(), 111)
+
+
+class StatementImportTests(FinanceTestCase):
+    url = '/api/finances/import-statement/'
+
+    CSV_STATEMENT = (
+        'Date,Description,Amount,Category\n'
+        '2025-03-01,Payroll,2500.00,\n'
+        '2025-03-02,Coffee,-3.50,food\n'
+        '2025-03-02,Coffee,-3.50,food\n'
+        'yesterday,Broken row,-1.00,\n'
+        '2025-03-04,Rent,"-1,200.00",rent\n'
+    )
+
+    OFX_STATEMENT = (
+        'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+        '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20250305120000\n<TRNAMT>-42.10\n<FITID>A1\n<NAME>Grocer\n</STMTTRN>\n'
+        '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20250306\n<TRNAMT>99.00\n<FITID>A2\n<NAME>Refund\n<MEMO>Order 7\n</STMTTRN>\n'
+        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+    )
+
+    def upload(self, name, content):
+        return self.client.post(self.url, {
+            'user_id': self.user.id,
+            'file': SimpleUploadedFile(name, content.encode()),
+        })
+
+    def test_csv_import_and_reimport_skips_duplicates(self):
+        response = self.upload('statement.csv', self.CSV_STATEMENT)
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['created'], data['duplicates'], data['failed']), (4, 0, 1))
+        self.assertIn('Line 5', data['errors'][0])
+        self.assertEqual(Expense.objects.filter(title='Coffee').count(), 2)
+        self.assertEqual(Expense.objects.get(title='Rent').expense, Decimal('1200.00'))
+        self.assertEqual(Income.objects.get(title='Payroll').category.name, 'income')
+        self.assertEqual(
+            MonthlyRollup.objects.get(user=self.user, kind='expense', category__name='food').total, Decimal('7.00')
+        )
+
+        data = self.upload('statement.csv', self.CSV_STATEMENT).json()
+        self.assertEqual((data['created'], data['duplicates']), (0, 4))
+        self.assertEqual(Expense.objects.count(), 3)
+
+    def test_identical_rows_apart_are_not_duplicates(self):
+        statement = (
+            'Date,Description,Amount\n'
+            '2025-03-02,Coffee,-3.50\n'
+            '2025-03-02,Bagel,-2.25\n'
+            '2025-03-02,Coffee,-3.50\n'
+        )
+        data = self.upload('statement.csv', statement).json()
+        self.assertEqual((data['created'], data['duplicates']), (3, 0))
+        self.assertEqual(Expense.objects.filter(title='Coffee').count(), 2)
+
+        data = self.upload('statement.csv', statement).json()
+        self.assertEqual((data['created'], data['duplicates']), (0, 3))
+
+    def test_non_finite_amounts_are_row_errors(self):
+        statement = (
+            'Date,Description,Amount\n'
+            '2025-03-02,Coffee,-3.50\n'
+            '2025-03-03,Broken,NaN\n'
+            '2025-03-04,Broken,-Infinity\n'
+        )
+        response = self.upload('statement.csv', statement)
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (1, 2))
+        self.assertIn('Line 3', data['errors'][0])
+        self.assertIn('Line 4', data['errors'][1])
+
+    def test_ofx_import_in_small_chunks(self):
+        rows = importers.read_statement(io.StringIO(self.OFX_STATEMENT), 'ofx')
+        summary = importers.import_statement(self.user, rows, chunk_size=1)
+
+        self.assertEqual((summary['created'], summary['failed']), (2, 0))
+        self.assertEqual(Expense.objects.get().expense, Decimal('42.10'))
+        self.assertEqual(Income.objects.get().description, 'Refund Order 7')
+
+        data = self.upload('statement.ofx', self.OFX_STATEMENT).json()
+        self.assertEqual(data['duplicates'], 2)
+
+    def test_unreadable_header(self):
+        response = self.upload('statement.csv', 'foo,bar\n1,2\n')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportCacheTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        caching.reset_stats()
+        self.url = f'/api/finances/{self.user.id}/reports/'
+
+    def test_daily_etag_and_window_follow_the_local_date(self):
+        etag = caching.etag_func('reports', daily=True)
+        request = RequestFactory().get(self.url)
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2025, 7, 1)):
+            first = etag(request, self.user.id)
+            self.assertEqual(reports.monthly_window_start(), date(2025, 1, 1))
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2025, 7, 2)):
+            self.assertNotEqual(etag(request, self.user.id), first)
+
+    def test_writes_invalidate_cached_reports(self):
+        self.add_expense(Decimal('10.00'), 3, 'food')
+        first = self.client.get(self.url).json()
+        self.assertEqual(self.client.get(self.url).json(), first)
+        self.assertEqual(caching.stats()['reports'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+        response = self.client.post('/api/finances/add-expense/', {
+            'user_id': self.user.id, 'amount': '5.00', 'category': 'food', 'date': '2025-03-04',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.client.get(self.url).json()['total_expenses'], 15.0)
+        self.assertEqual(caching.stats()['reports']['misses'], 2)
+
+    def test_parameters_are_part_of_the_key(self):
+        self.add_expense(Decimal('10.00'), 3, 'food')
+        self.add_expense(Decimal('20.00'), 3, 'rent')
+
+        self.assertEqual(self.client.get(self.url, {'category': 'food'}).json()['total_expenses'], 10.0)
+        self.assertEqual(self.client.get(self.url, {'category': 'rent'}).json()['total_expenses'], 20.0)
+
+    def test_stats_require_staff(self):
+        self.assertEqual(self.client.get('/api/finances/cache-stats/').status_code, 401)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/finances/cache-stats/').status_code, 200)
+
+
+class ConditionalGetTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_budget('food', Decimal('100.00'))
+        self.add_expense(Decimal('10.00'), 3, 'food')
+        self.urls = [
+            f'/api/finances/{self.user.id}/finance-details/',
+            f'/api/finances/{self.user.id}/budget/',
+            f'/api/finances/{self.user.id}/reports/',
+        ]
+
+    def test_unchanged_data_returns_304_without_running_the_view(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+
+            # Only the data version lookup runs
+            with self.assertNumQueries(1):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+
+            other_params = self.client.get(url, {'category': 'food'}, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(other_params.status_code, 200)
+
+    def test_writes_change_the_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+
+        self.client.post('/api/finances/add-expense/', {
+            'user_id': self.user.id, 'amount': '5.00', 'category': 'food', 'date': '2025-03-04',
+        }, content_type='application/json')
+
+        for url, etag in zip(self.urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ReportEngineTests(FinanceTestCase):
+    today = date(2025, 6, 15)
+
+    def setUp(self):
+        super().setUp()
+        self.add_income(Decimal('1000.00'), 1, month=1)
+        self.add_income(Decimal('1200.00'), 1, month=3)
+        self.add_expense(Decimal('50.00'), 10, 'food', month=3)
+        self.add_expense(Decimal('70.00'), 20, 'food', month=3)
+        self.add_expense(Decimal('900.00'), 2, 'rent', month=4)
+        self.add_expense(Decimal('30.00'), 5, 'food', month=5)
+
+    def test_sections(self):
+        report = reports.build_report(self.user.id, today=self.today)
+
+        self.assertEqual(report['total_income'], 2200.0)
+        self.assertEqual(report['total_expenses'], 1050.0)
+        self.assertEqual(
+            [(c['category'], c['total']) for c in report['expense_categories']],
+            [('rent', Decimal('900.00')), ('food', Decimal('150.00'))]
+        )
+        self.assertEqual(report['overall_expense_categories'], report['expense_categories'])
+        # The monthly series covers whole months from December 2024 and includes income
+        self.assertEqual(report['monthly_data'], [
+            {'month': 'January 2025', 'income': Decimal('1000.00'), 'expenses': 0},
+            {'month': 'March 2025', 'income': Decimal('1200.00'), 'expenses': Decimal('120.00')},
+            {'month': 'April 2025', 'income': 0, 'expenses': Decimal('900.00')},
+            {'month': 'May 2025', 'income': 0, 'expenses': Decimal('30.00')},
+        ])
+
+    def test_filters(self):
+        report = reports.build_report(self.user.id, '2025-03-15', '2025-05-31', 'food', today=self.today)
+
+        self.assertEqual(report['total_income'], 0.0)
+        self.assertEqual(report['total_expenses'], 100.0)
+        self.assertEqual([m['month'] for m in report['monthly_data']], ['March 2025', 'May 2025'])
+
+    def test_query_budget(self):
+        # Plus one query each for the category names, which are not cached inside a test transaction
+        with self.assertNumQueries(2):
+            reports.build_report(self.user.id, today=self.today)
+        with self.assertNumQueries(2):
+            reports.build_report(self.user.id, '2025-01-01', '2025-04-30', today=self.today)
+        with self.assertNumQueries(reports.REPORT_QUERY_BUDGET + 1):
+            reports.build_report(self.user.id, '2025-01-15', '2025-04-20', today=self.today)
+
+
+class DashboardSummaryTests(TransactionTestCase):
+    # The summary queries run on their own connections in worker threads,
+    # so the data has to be committed rather than held in a test transaction
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bob', email='bob@example.com', password='secret-pass-123')
+        today = date.today()
+        category_ids = categories.get_or_create_many(self.user.id, ['income', 'food'])
+        Income.objects.create(
+            user=self.user, title='Salary', category_id=category_ids['income'], income=Decimal('2000.00'),
+            date=today.replace(day=1)
+        )
+        for day in range(1, 8):
+            Expense.objects.create(
+                user=self.user, title=f'Lunch {day}', category_id=category_ids['food'], expense=Decimal('10.00'),
+                date=today.replace(day=day)
+            )
+        MonthlyBudget.objects.create(
+            user=self.user, title='Food', category_id=category_ids['food'], month=str(today.month).zfill(2), year=today.year,
+            amount=Decimal('100.00')
+        )
+        rollups.rebuild(self.user.id)
+
+    def test_combined_payload(self):
+        response = self.client.get(f'/api/finances/{self.user.id}/dashboard/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['budget']['total_income'], 2000.0)
+        self.assertEqual(data['budget']['total_expense'], 70.0)
+        self.assertEqual(data['budget']['category_budgets'], {'food': 100.0})
+        self.assertEqual(data['totals'], {'income': 2000.0, 'expenses': 70.0})
+        self.assertEqual([entry['title'] for entry in data['recent']],
+                         ['Lunch 7', 'Lunch 6', 'Lunch 5', 'Lunch 4', 'Lunch 3'])
+
+    def test_workers_keep_their_connections(self):
+        # Connect every worker thread first; which worker runs which lookup is up to the pool
+        barrier = threading.Barrier(views.DASHBOARD_WORKERS)
+
+        def connect(_):
+            barrier.wait()
+            connection.ensure_connection()
+        list(views._dashboard_executor.map(connect, range(views.DASHBOARD_WORKERS)))
+
+        opened = []
+        def record(sender, connection, **kwargs):
+            opened.append(connection.alias)
+        connection_created.connect(record)
+        self.addCleanup(connection_created.disconnect, record)
+        for _ in range(3):
+            self.assertEqual(self.client.get(f'/api/finances/{self.user.id}/dashboard/').status_code, 200)
+        self.assertEqual(opened, [])
+
+    def test_unknown_user_and_bad_dates(self):
+        with (
+            mock.patch.object(views, '_cached_budget_summary') as budget,
+            mock.patch.object(views, '_lifetime_totals') as totals,
+            mock.patch.object(views, '_recent_entries') as recent,
+        ):
+            self.assertEqual(self.client.get('/api/finances/999999/dashboard/').status_code, 404)
+        for lookup in [budget, totals, recent]:
+            lookup.assert_not_called()
+        response = self.client.get(f'/api/finances/{self.user.id}/dashboard/', {'start_date': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PerformanceMiddlewareTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        performance.reset_stats()
+
+    def test_server_timing_header(self):
+        self.add_expense(Decimal('10.00'), 3, 'food')
+        url = f'/api/finances/{self.user.id}/finance-details/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'paginate': '1'})
+
+        timings = dict(part.strip().split(';', 1) for part in response['Server-Timing'].split(','))
+        self.assertEqual(set(timings), {'db', 'serialize', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+
+    def test_percentiles_per_endpoint(self):
+        url = f'/api/finances/{self.user.id}/budget/'
+        for _ in range(3):
+            self.client.get(url)
+
+        stats = performance.endpoint_stats()['GET api/finances/<int:user_id>/budget/']
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(set(stats['total_ms']), {'p50', 'p95', 'p99'})
+
+        self.assertEqual(self.client.get('/api/debug/performance/').status_code, 401)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertIn('GET api/finances/<int:user_id>/budget/',
+                      self.client.get('/api/debug/performance/').json())
+
+
+    def test_unmatched_requests_share_one_window(self):
+        for path in ['/no/such/page/', '/another/missing/page/']:
+            self.client.get(path)
+        self.client.generic('MADEUP', '/yet/another/')
+
+        stats = performance.endpoint_stats()
+        self.assertEqual(stats[f'GET {performance.UNMATCHED}']['count'], 2)
+        self.assertEqual(stats[f'OTHER {performance.UNMATCHED}']['count'], 1)
+        self.assertEqual(len(stats), 2)
+
+    def test_async_requests_count_queries_of_worker_threads(self):
+        def query():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                connections.close_all()
+
+        async def view(request):
+            await sync_to_async(query, thread_sensitive=False)()
+            return HttpResponse()
+
+        middleware = performance.PerformanceMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+class SeedingTests(FinanceTestCase):
+    def test_seed_user(self):
+        seeding.seed_user(self.user, incomes=20, expenses=180, budgets=15, months=6, end=date(2025, 3, 31))
+
+        self.assertEqual(Income.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 180)
+        self.assertEqual(MonthlyBudget.objects.filter(user=self.user).count(), 15)
+        self.assertFalse(Expense.objects.filter(user=self.user, date__lt=date(2024, 10, 1)).exists())
+        self.assertFalse(Expense.objects.filter(user=self.user, date__gt=date(2025, 3, 31)).exists())
+        # Budgets fill the latest month first
+        self.assertEqual(MonthlyBudget.objects.filter(user=self.user, year=2025, month='03').count(), 10)
+        self.assertEqual(
+            sum(row.count for row in MonthlyRollup.objects.filter(user=self.user)), 200
+        )
+
+    def test_benchmark_covers_every_endpoint(self):
+        names = {pattern.name for pattern in finance_urls.urlpatterns + user_urls.urlpatterns}
+        self.assertEqual(names, set(SCENARIOS))
+
+
+class FinanceQueryBudgetTests(querybudget.QueryBudgetTestCase):
+    urlconf = finance_urls
+    budgets = {
+        'add-income': QueryBudget(queries=7, rows=3),
+        'add-expense': QueryBudget(queries=7, rows=3),
+        'add-batch': QueryBudget(queries=7, rows=3),
+        'import-statement': QueryBudget(queries=9, rows=110),
+        'budget': QueryBudget(queries=7, rows=50),
+        'finance_details': QueryBudget(queries=2, rows=FINANCE_PAGE_SIZE + 2),
+        'dashboard_summary': QueryBudget(queries=6, rows=50),
+        'export_finance_entries': QueryBudget(queries=1, rows=None),
+        'budget_details': QueryBudget(queries=2, rows=30),
+        'budget_trends': QueryBudget(queries=7, rows=150),
+        'update_budget_entry': QueryBudget(queries=6, rows=3),
+        'delete_budget_entry': QueryBudget(queries=4, rows=2),
+        'delete_finance_entry': QueryBudget(queries=8, rows=3),
+        'update_finance_entry': QueryBudget(queries=7, rows=3),
+        'get_reports': QueryBudget(queries=5, rows=300),
+        # One row per category and day of history, by design
+        'spending_analytics': QueryBudget(queries=5, rows=None),
+        'set-monthly-budget': QueryBudget(queries=10, rows=3),
+        'cache_stats': QueryBudget(queries=2, rows=2),
+    }
+
+
+class ReplicaRoutingTests(FinanceTestCase):
+    def test_test_mirror_is_not_used_as_a_replica(self):
+        self.assertFalse(routers.replica_available())
+
+    @mock.patch('backend.routers.replica_available', return_value=True)
+    def test_writes_pin_the_user_to_the_primary(self, _):
+        router = routers.PrimaryReplicaRouter()
+        with routers.replica_reads(self.user.id):
+            self.assertEqual(router.db_for_read(Expense), routers.REPLICA)
+        self.assertIsNone(router.db_for_read(Expense))
+        self.assertEqual(router.db_for_write(Expense), 'default')
+
+        caching.bump_version(self.user.id)
+        with routers.replica_reads(self.user.id):
+            self.assertIsNone(router.db_for_read(Expense))
+
+
+
+class SyncedReplicaTests(TransactionTestCase):
+    """Routing against a real replica file, copied from the test database by sync_replica."""
+    databases = {'default', routers.REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='secret-pass-123')
+        expense = Expense.objects.create(
+            user=self.user, title='Spend', category_id=categories.get_or_create(self.user.id, 'food'),
+            expense='12.50', date=date(2025, 3, 4)
+        )
+        rollups.entries_added([expense])
+
+        replica = connections[routers.REPLICA]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(replica.settings_dict.__setitem__, 'NAME', replica.settings_dict['NAME'])
+        self.addCleanup(replica.close)
+        replica.close()
+        replica.settings_dict['NAME'] = os.path.join(directory.name, 'replica.sqlite3')
+
+    def sync(self):
+        call_command('sync_replica', stdout=io.StringIO())
+
+    def test_replica_is_unused_until_synced(self):
+        self.assertFalse(routers.replica_available())
+        self.assertFalse(os.path.exists(connections[routers.REPLICA].settings_dict['NAME']))
+        self.sync()
+        self.assertTrue(routers.replica_available())
+        with routers.replica_reads(self.user.id) as alias:
+            self.assertEqual(alias, routers.REPLICA)
+            self.assertEqual(Expense.objects.count(), 1)
+
+        with override_settings(REPLICA_MAX_LAG_SECONDS=0):
+            self.assertFalse(routers.replica_available())
+
+    def test_failing_replica_falls_back_to_the_primary(self):
+        self.sync()
+        with connections[routers.REPLICA].cursor() as cursor:
+            cursor.execute('DROP TABLE finances_dataversion')  # As if copied before a migration
+
+        response = self.client.get(f'/api/finances/{self.user.id}/reports/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_expenses'], 12.5)
+        # The broken copy is not used again until the next sync
+        self.assertFalse(routers.replica_available())
+        self.sync()
+        self.assertTrue(routers.replica_available())
+
+    def test_export_streams_its_rows_from_the_replica(self):
+        self.sync()
+        with CaptureQueriesContext(connections[routers.REPLICA]) as replica_queries, \
+                CaptureQueriesContext(connection) as primary_queries:
+            response = self.client.get(f'/api/finances/{self.user.id}/export/')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('food', lines[1])
+        self.assertTrue(any('UNION' in query['sql'] for query in replica_queries))
+        self.assertFalse(any('finances_expense' in query['sql'] for query in primary_queries))
+
+
+class SqliteProfileTests(TestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory.name, 'profile.sqlite3')}
+        fresh = connections[DEFAULT_DB_ALIAS].__class__(settings_dict, alias='profile')
+        self.addCleanup(fresh.close)
+
+        with fresh.cursor() as cursor:
+            pragmas = {}
+            for name in ['journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'temp_store', 'foreign_keys']:
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal',
+            'synchronous': 1,  # NORMAL
+            'busy_timeout': 5000,
+            'cache_size': -65536,
+            'temp_store': 2,  # MEMORY
+            'foreign_keys': 1,
+        })
+        self.assertEqual(fresh.transaction_mode, 'IMMEDIATE')
+
+class MoneyFieldTests(FinanceTestCase):
+    def test_amounts_are_stored_as_cents(self):
+        expense = self.add_expense('12.34', 3)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT expense FROM finances_expense WHERE id = %s', [expense.id])
+            self.assertEqual(cursor.fetchone()[0], 1234)
+        expense.refresh_from_db()
+        self.assertEqual(expense.expense, Decimal('12.34'))
+        self.assertEqual(Expense.objects.filter(expense__gt='12.33').count(), 1)
+
+    def test_totals_do_not_drift(self):
+        for _ in range(10):
+            self.add_expense('0.10', 3, 'food')
+        self.add_expense('0.20', 4, 'food')
+
+        self.assertEqual(Expense.objects.aggregate(total=Sum('expense'))['total'], Decimal('1.20'))
+        report = reports.build_report(self.user.id, '2025-03-02', '2025-03-31')
+        self.assertEqual(report['total_expenses'], 1.2)
+
+    def test_validation(self):
+        field = Expense._meta.get_field('expense')
+        self.assertEqual(field.clean('7.5', None), Decimal('7.5'))
+        for value in ['abc', '1.234', '123456789.00', 'NaN']:
+            with self.assertRaises(ValidationError):
+                field.clean(value, None)
+
+
+class CategoryTests(FinanceTestCase):
+    def setUp(self):
+        super().setUp()
+        categories.clear()
+
+    def test_names_are_interned_per_user(self):
+        other = User.objects.create_user(username='carol', email='carol@example.com', password='secret-pass-123')
+        food = categories.get_or_create(self.user.id, 'food')
+        self.assertEqual(categories.get_or_create_many(self.user.id, ['food', 'rent'])['food'], food)
+        self.assertNotEqual(categories.get_or_create(other.id, 'food'), food)
+        self.assertEqual(categories.find(self.user.id, 'travel'), categories.NO_CATEGORY)
+        self.assertEqual(categories.names(self.user.id)[food], 'food')
+
+    def test_committed_names_are_cached(self):
+        food = categories.get_or_create(self.user.id, 'food')
+        with self.captureOnCommitCallbacks(execute=True):
+            categories.names(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(categories.names(self.user.id)[food], 'food')
+            self.assertEqual(categories.find(self.user.id, 'food'), food)
+
+    def test_rename_is_one_row(self):
+        self.add_expense('5.00', 3, 'food')
+        self.add_expense('7.00', 4, 'food')
+        food = categories.find(self.user.id, 'food')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(categories.rename(self.user.id, food, 'groceries'))
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "finances_category"') for query in queries), 1)
+        self.assertFalse(any('finances_expense' in query['sql'] for query in queries))
+
+        details = self.client.get(f'/api/finances/{self.user.id}/finance-details/').json()['finance']
+        self.assertEqual({entry['category'] for entry in details}, {'groceries'})
+        report = self.client.get(f'/api/finances/{self.user.id}/reports/').json()
+        self.assertEqual(report['expense_categories'], [{'category': 'groceries', 'total': 12.0}])
+
+    def test_unknown_category_filter_matches_nothing(self):
+        self.add_expense('5.00', 3, 'food')
+        response = self.client.get(f'/api/finances/{self.user.id}/finance-details/', {'category': 'travel'})
+        self.assertEqual(response.json()['finance'], [])
@@ -1,17 +1,24 @@
 from django.urls import path
-from .views import AddIncomeView, AddExpenseView, BudgetCalculatorView, SetMonthlyBudgetView, finance_details, delete_finance_entry, update_finance_entry, budget_details
+from .views import AddIncomeView, AddExpenseView, BatchEntriesView, StatementImportView, BudgetCalculatorView, SetMonthlyBudgetView, finance_details, delete_finance_entry, update_finance_entry, budget_details
 from . import views
 
 urlpatterns = [
     path('add-income/', AddIncomeView.as_view(), name='add-income'),
     path('add-expense/', AddExpenseView.as_view(), name='add-expense'),
+    path('add-batch/', BatchEntriesView.as_view(), name='add-batch'),
+    path('import-statement/', StatementImportView.as_view(), name='import-statement'),
     path('budget/', BudgetCalculatorView.as_view(), name='budget'),
     path('<int:user_id>/finance-details/', finance_details, name='finance_details'),
+    path('<int:user_id>/dashboard/', views.dashboard_summary, name='dashboard_summary'),
+    path('<int:user_id>/export/', views.export_finance_entries, name='export_finance_entries'),
     path('<int:user_id>/budget/', budget_details, name='budget_details'),
+    path('<int:user_id>/budget/trends/', views.budget_trends, name='budget_trends'),
     path('<int:user_id>/budget/update/<int:entry_id>/', views.update_budget_entry, name='update_budget_entry'),
     path('<int:user_id>/budget/delete/<int:entry_id>/', views.delete_budget_entry, name='delete_budget_entry'),
     path('delete/<int:user_id>/<int:entry_id>/', delete_finance_entry, name='delete_finance_entry'),
     path('update/<int:user_id>/<int:entry_id>/', update_finance_entry, name='update_finance_entry'),
     path('<int:user_id>/reports/', views.get_reports, name='get_reports'),
+    path('<int:user_id>/analytics/', views.spending_analytics, name='spending_analytics'),
     path('set-monthly-budget/', SetMonthlyBudgetView.as_view(), name='set-monthly-budget'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
 ]
\ No newline at end of file
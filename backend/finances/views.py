@@ -1,24 +1,41 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
 from .models import Income
 from .models import Expense
 from .models import MonthlyBudget
-from django.core.exceptions import ObjectDoesNotExist
+from .models import MonthlyRollup
+from .models import Category
+from . import analytics, budgets, caching, categories, entries, importers, reports, rollups
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.shortcuts import get_object_or_404
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.db.models import Sum
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.core.serializers import serialize
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from django.db.models.functions import TruncMonth
 from datetime import datetime, timedelta
-from django.db import DatabaseError
+from django.db import DatabaseError, close_old_connections, transaction
+from asgiref.sync import sync_to_async
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from django.utils import timezone
 from decimal import InvalidOperation
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+import io
+import logging
+from backend.performance import serialization
+from backend.routers import on_replica, read_alias, reads_from_replica
+
+logger = logging.getLogger(__name__)
 
 
 User = get_user_model()
@@ -26,7 +43,7 @@ class SetMonthlyBudgetView(APIView):
     def post(self, request):
         user = request.user  # Get the authenticated user
         title = request.data.get('title')
-        category = request.data.get('category', 'expenses')
+        category = request.data.get('category', categories.DEFAULT_EXPENSE)
         amount = request.data.get('amount')
         month = str(request.data.get('month')).zfill(2)  # Month (01 to 12)
         year = request.data.get('year')  # Year (e.g., 2025)
@@ -51,14 +68,17 @@ class SetMonthlyBudgetView(APIView):
         # Ensure that the budget for the user is set for the given month and year
         try:
             # If description is None, it will be omitted from the update_or_create
-            budget, created = MonthlyBudget.objects.update_or_create(
-                user=user,
-                title=title,
-                category=category,
-                month=month,
-                year=year,
-                defaults={'amount': amount, 'description': description}  # Include description only if provided
-            )
+            category_id = categories.get_or_create(user.id, category)
+            with transaction.atomic():
+                budget, created = MonthlyBudget.objects.update_or_create(
+                    user_id=user.id,
+                    title=title,
+                    category_id=category_id,
+                    month=month,
+                    year=year,
+                    defaults={'amount': amount, 'description': description}  # Include description only if provided
+                )
+                caching.bump_version(user.id)
         except DatabaseError as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -81,13 +101,18 @@ class AddIncomeView(APIView):
         user = get_object_or_404(User, id=user_id)
 
         try:
-            income = Income.objects.create(
-                user=user,
-                income=amount,
-                date=date,
-                title=title,
-                description=description
-            )
+            category_id = categories.get_or_create(user.id, categories.DEFAULT_INCOME)
+            with transaction.atomic():
+                income = Income.objects.create(
+                    user=user,
+                    category_id=category_id,
+                    income=amount,
+                    date=date,
+                    title=title,
+                    description=description
+                )
+                rollups.entries_added([income])
+                caching.bump_version(user.id)
             return Response({'message': 'Income added successfully', 'income_id': income.id}, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -96,7 +121,7 @@ class AddExpenseView(APIView):
     def post(self, request):
         user_id = request.data.get('user_id')
         amount = request.data.get('amount')
-        category = request.data.get('category', 'expenses')  # default to 'expenses' if not provided
+        category = request.data.get('category', categories.DEFAULT_EXPENSE)  # default to 'expenses' if not provided
         date = request.data.get('date')
         title = request.data.get('title', 'Untitled')  # default to 'Untitled' if not provided
         description = request.data.get('description')  # can be None
@@ -107,18 +132,152 @@ class AddExpenseView(APIView):
         user = get_object_or_404(User, id=user_id)
 
         try:
-            expense = Expense.objects.create(
-                user=user,
-                expense=amount,
-                category=category,
-                date=date,
-                title=title,
-                description=description
-            )
+            category_id = categories.get_or_create(user.id, category)
+            with transaction.atomic():
+                expense = Expense.objects.create(
+                    user=user,
+                    expense=amount,
+                    category_id=category_id,
+                    date=date,
+                    title=title,
+                    description=description
+                )
+                rollups.entries_added([expense])
+                caching.bump_version(user.id)
             return Response({'message': 'Expense added successfully', 'expense_id': expense.id}, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+BATCH_MAX_ROWS = 10000
+BATCH_CREATE_SIZE = 1000
+
+
+def _build_entry(user, row):
+    """
+    Return an unsaved Income or Expense for one batch row, without its category
+    id, and the row's category name. Raises ValidationError if it is invalid.
+    """
+    if not isinstance(row, dict):
+        raise ValidationError('Each entry must be an object.')
+
+    entry_type = row.get('type')
+    if entry_type == 'income':
+        model, amount_field, default_category = Income, 'income', categories.DEFAULT_INCOME
+    elif entry_type == 'expense':
+        model, amount_field, default_category = Expense, 'expense', categories.DEFAULT_EXPENSE
+    else:
+        raise ValidationError('Invalid type. Must be "income" or "expense".')
+
+    missing_fields = [name for name in ['amount', 'date'] if row.get(name) in (None, '')]
+    if missing_fields:
+        raise ValidationError(f'Missing required fields: {", ".join(missing_fields)}')
+
+    values = {
+        'title': row.get('title', 'Untitled'),
+        'description': row.get('description'),
+        'category': row.get('category') or default_category,
+        amount_field: row['amount'],
+        'date': row['date'],
+    }
+    for name, value in values.items():
+        field = Category._meta.get_field('name') if name == 'category' else model._meta.get_field(name)
+        try:
+            values[name] = field.clean(value, None)
+        except ValidationError as e:
+            raise ValidationError(f'{name}: {" ".join(e.messages)}')
+        except (TypeError, ValueError):
+            # to_python() of some fields raises these for values of the wrong JSON type
+            raise ValidationError(f'{name}: Invalid value {value!r}.')
+    category = values.pop('category')
+    return model(user=user, **values), category
+
+
+class BatchEntriesView(APIView):
+    def post(self, request):
+        user_id = request.data.get('user_id')
+        rows = request.data.get('entries')
+
+        if not user_id or not isinstance(rows, list) or not rows:
+            return Response({'error': 'user_id and a non-empty entries list are required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) > BATCH_MAX_ROWS:
+            return Response({'error': f'At most {BATCH_MAX_ROWS} entries can be sent at once.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = get_object_or_404(User, id=user_id)
+
+        # Validate every row first, then insert the valid ones together
+        results = [None] * len(rows)
+        pending = {Income: [], Expense: []}
+        for index, row in enumerate(rows):
+            try:
+                entry, category = _build_entry(user, row)
+            except ValidationError as e:
+                results[index] = {'index': index, 'status': 'error', 'errors': e.messages}
+                continue
+            pending[type(entry)].append((index, entry, category))
+
+        try:
+            with transaction.atomic():
+                # Every category in the batch is looked up, or created, at once
+                category_ids = categories.get_or_create_many(
+                    user.id, {category for items in pending.values() for _, _, category in items}
+                )
+                created = []
+                for model, items in pending.items():
+                    for _, entry, category in items:
+                        entry.category_id = category_ids[category]
+                    objs = model.objects.bulk_create([entry for _, entry, _ in items], batch_size=BATCH_CREATE_SIZE)
+                    for (index, _, _), entry in zip(items, objs):
+                        results[index] = {'index': index, 'status': 'created', 'type': rollups.kind_of(entry), 'id': entry.id}
+                    created.extend(objs)
+                rollups.entries_added(created)
+                if created:
+                    caching.bump_version(user.id)
+        except DatabaseError as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        created_count = len(created)
+        if created_count == len(rows):
+            response_status = status.HTTP_201_CREATED
+        elif created_count:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            'created': created_count,
+            'failed': len(rows) - created_count,
+            'results': results,
+        }, status=response_status)
+
+class StatementImportView(APIView):
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        user_id = request.data.get('user_id')
+        upload = request.FILES.get('file')
+
+        if not user_id or not upload:
+            return Response({'error': 'user_id and file are required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        statement_format = (request.data.get('format') or upload.name.rsplit('.', 1)[-1]).lower()
+        if statement_format not in importers.IMPORT_FORMATS:
+            return Response({'error': 'format must be "csv" or "ofx".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = get_object_or_404(User, id=user_id)
+
+        # Large uploads are spooled to a temporary file, so this reads lazily from disk
+        text_file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+        try:
+            rows = importers.read_statement(text_file, statement_format, request.data.get('date_format'))
+            summary = importers.import_statement(user, rows)
+        except importers.StatementError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except DatabaseError as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(summary, status=status.HTTP_201_CREATED if summary['created'] else status.HTTP_200_OK)
+
 class MonthlyBudgetCalculatorView(APIView):
     def post(self, request):
         user_id = request.data.get('user_id')
@@ -140,8 +299,7 @@ class MonthlyBudgetCalculatorView(APIView):
         # Sum all monthly budget entries for the given month and year
         total_budget = MonthlyBudget.objects.filter(
             user=user,
-            month=month,
-            year=year
+            period=int(year) * 100 + int(month)
         ).aggregate(total=Sum('amount'))['total'] or 0
 
         # Return the total budget for the specified month and year
@@ -149,6 +307,77 @@ class MonthlyBudgetCalculatorView(APIView):
             'total_budget': float(total_budget),
         }, status=status.HTTP_200_OK)
 
+def _budget_summary(user_id, start_date, end_date):
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+
+    # Budget per category for every month the range touches, in one GROUP BY
+    # query over a range of the period index
+    budget_totals = MonthlyBudget.objects.filter(
+        user_id=user_id,
+        period__range=(MonthlyBudget.period_of(start), MonthlyBudget.period_of(end))
+    ).values('category').annotate(total=Sum('amount'))
+
+    # Income and expense sums for the range, read from the monthly rollup
+    expense_totals = {}
+    total_income = 0
+    for row in rollups.monthly_totals(user_id, start_date, end_date):
+        if row['kind'] == rollups.INCOME:
+            total_income += row['total']
+        else:
+            expense_totals[row['category']] = expense_totals.get(row['category'], 0) + row['total']
+
+    category_budgets = {}
+    category_expenses = {}
+    category_alerts = {}
+
+    # Join the two result sets in memory, on category ids
+    names = categories.names(user_id)
+    for row in budget_totals:
+        category_name = names[row['category']]
+        budget_amount = row['total'] or 0
+        expense_amount = expense_totals.get(row['category']) or 0
+
+        category_budgets[category_name] = float(budget_amount)
+        category_expenses[category_name] = float(expense_amount)
+
+        # Calculate budget usage percentage
+        if budget_amount > 0:
+            usage_percentage = (expense_amount / budget_amount) * 100
+            if usage_percentage >= 100:
+                category_alerts[category_name] = {
+                    'status': 'exceeded',
+                    'percentage': usage_percentage,
+                    'remaining': float(budget_amount - expense_amount)
+                }
+            elif usage_percentage >= 80:
+                category_alerts[category_name] = {
+                    'status': 'warning',
+                    'percentage': usage_percentage,
+                    'remaining': float(budget_amount - expense_amount)
+                }
+
+    # Calculate overall totals
+    total_expense = sum(expense_totals.values()) or 0
+    budget = total_income - total_expense
+
+    return {
+        'total_income': float(total_income),
+        'total_expense': float(total_expense),
+        'budget': float(budget),
+        'category_budgets': category_budgets,
+        'category_expenses': category_expenses,
+        'category_alerts': category_alerts
+    }
+
+
+def _cached_budget_summary(user_id, start_date, end_date):
+    return caching.cached(
+        'budget', user_id, {'start_date': start_date, 'end_date': end_date},
+        lambda: _budget_summary(user_id, start_date, end_date)
+    )
+
+
 class BudgetCalculatorView(APIView):
     def post(self, request):
         user_id = request.data.get('user_id')
@@ -161,199 +390,243 @@ class BudgetCalculatorView(APIView):
         if not start_date or not end_date:
             return Response({'error': 'start_date and end_date are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        summary = on_replica(user_id, self.summary, user_id, start_date, end_date)
+        return Response(summary, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def summary(user_id, start_date, end_date):
         user = get_object_or_404(User, id=user_id)
+        return _cached_budget_summary(user.id, start_date, end_date)
+        
+DASHBOARD_RECENT_ENTRIES = 5
+DASHBOARD_WORKERS = 4  # One per concurrent dashboard lookup
+
+# Dashboard lookups run on these threads, which keep their database connections
+# between requests the way request threads do, so a dashboard request opens none
+_dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix='dashboard')
+
+
+def _in_worker_thread(func):
+    """
+    Wrap a blocking ORM function so it runs on a dashboard worker thread, and
+    therefore on that thread's own database connection.
+    """
+    def run(*args):
+        # As Django does around every request: drop connections past CONN_MAX_AGE or broken ones
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False, executor=_dashboard_executor)
 
-        # Always use two-digit month string for filtering
-        month = str(datetime.strptime(start_date, '%Y-%m-%d').month).zfill(2)
-        year = datetime.strptime(start_date, '%Y-%m-%d').year
 
-        # Get all categories from MonthlyBudget
-        budget_categories = MonthlyBudget.objects.filter(
-            user=user,
-            month=month,
-            year=year
-        ).values('category').distinct()
-
-        category_budgets = {}
-        category_expenses = {}
-        category_alerts = {}
-
-        # Calculate budget and expenses for each category
-        for category in budget_categories:
-            category_name = category['category']
-            
-            # Get budget for this category
-            budget_amount = MonthlyBudget.objects.filter(
-                user=user,
-                category=category_name,
-                month=month,
-                year=year
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            # Get expenses for this category
-            expense_amount = Expense.objects.filter(
-                user=user,
-                category=category_name,
-                date__range=[start_date, end_date]
-            ).aggregate(total=Sum('expense'))['total'] or 0
-
-            category_budgets[category_name] = float(budget_amount)
-            category_expenses[category_name] = float(expense_amount)
-
-            # Calculate budget usage percentage
-            if budget_amount > 0:
-                usage_percentage = (expense_amount / budget_amount) * 100
-                if usage_percentage >= 100:
-                    category_alerts[category_name] = {
-                        'status': 'exceeded',
-                        'percentage': usage_percentage,
-                        'remaining': float(budget_amount - expense_amount)
-                    }
-                elif usage_percentage >= 80:
-                    category_alerts[category_name] = {
-                        'status': 'warning',
-                        'percentage': usage_percentage,
-                        'remaining': float(budget_amount - expense_amount)
-                    }
-
-        # Calculate overall totals
-        total_income = Income.objects.filter(
-            user=user,
-            date__range=[start_date, end_date]
-        ).aggregate(total=Sum('income'))['total'] or 0
+def _recent_entries(user_id):
+    incomes, expenses = entries.filter_entries(user_id)
+    merged = entries.merged_entries(incomes, expenses, descending=True)
+    names = categories.names(user_id)
+    return [entries.entry_to_json(row, names) for row in merged[:DASHBOARD_RECENT_ENTRIES]]
 
-        total_expense = Expense.objects.filter(
-            user=user,
-            date__range=[start_date, end_date]
-        ).aggregate(total=Sum('expense'))['total'] or 0
 
-        total_budget = sum(category_budgets.values())
-        budget = total_income - total_expense
+def _lifetime_totals(user_id):
+    totals = {rollups.INCOME: 0, rollups.EXPENSE: 0}
+    for row in MonthlyRollup.objects.filter(user_id=user_id).values('kind').annotate(total=Sum('total')):
+        totals[row['kind']] = row['total']
+    return {'income': float(totals[rollups.INCOME]), 'expenses': float(totals[rollups.EXPENSE])}
 
-        return Response({
-            'total_income': float(total_income),
-            'total_expense': float(total_expense),
-            'budget': float(budget),
-            'category_budgets': category_budgets,
-            'category_expenses': category_expenses,
-            'category_alerts': category_alerts
-        }, status=status.HTTP_200_OK)
-        
+
+@reads_from_replica
+async def dashboard_summary(request, user_id):
+    # Everything dashboard.jsx needs in one round trip; the queries run concurrently
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed.'}, status=405)
+
+    today = timezone.localdate()
+    start_date = request.GET.get('start_date') or today.replace(day=1).isoformat()
+    end_date = request.GET.get('end_date') or (
+        (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    ).isoformat()
+    try:
+        datetime.strptime(start_date, '%Y-%m-%d')
+        datetime.strptime(end_date, '%Y-%m-%d')
+    except ValueError:
+        return JsonResponse({'error': 'start_date and end_date must be YYYY-MM-DD.'}, status=400)
+
+    if not await _in_worker_thread(User.objects.filter(id=user_id).exists)():
+        return JsonResponse({'error': 'User not found.'}, status=404)
+
+    budget, totals, recent = await asyncio.gather(
+        _in_worker_thread(_cached_budget_summary)(user_id, start_date, end_date),
+        _in_worker_thread(_lifetime_totals)(user_id),
+        _in_worker_thread(_recent_entries)(user_id),
+    )
+
+    return JsonResponse({
+        'start_date': start_date,
+        'end_date': end_date,
+        'budget': budget,
+        'totals': totals,
+        'recent': recent,
+    })
+
+
+FINANCE_PAGE_SIZE = 50
+FINANCE_MAX_PAGE_SIZE = 500
+
+
+def _entry_key(entry):
+    return (entry['date'], entry['type'], entry['id'])
+
+
+def _encode_cursor(entry):
+    return urlsafe_base64_encode('|'.join(str(part) for part in _entry_key(entry)).encode())
+
+
+def _decode_cursor(cursor):
+    """Return (date, type, id) from a cursor, raising ValueError if it is malformed."""
+    date_str, entry_type, entry_id = urlsafe_base64_decode(cursor).decode().split('|')
+    if entry_type not in ('income', 'expense'):
+        raise ValueError(f'Unknown entry type {entry_type!r}')
+    return datetime.strptime(date_str, '%Y-%m-%d').date(), entry_type, int(entry_id)
+
+
+@reads_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.etag_func('finance-details'))
 def finance_details(request, user_id):
     # Get query parameters
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     category = request.GET.get('category')  # New category filter
     filter_type = request.GET.get('type', '')  # Filter by income or expense
+    paginate = request.GET.get('paginate', 'true').lower() not in ['false', '0', 'no']
+    order = request.GET.get('order', 'asc').lower()
 
     filter_type = filter_type.lower()
 
-    # Fetch incomes and expenses for the given user
-    incomes = Income.objects.filter(user_id=user_id)
-    expenses = Expense.objects.filter(user_id=user_id)
-
-    # Apply date range filter if provided
-    if start_date and end_date:
-        incomes = incomes.filter(date__range=[start_date, end_date])
-        expenses = expenses.filter(date__range=[start_date, end_date])
-
-    # Apply category filter if provided
-    if category and category != 'all':  # 'all' means no category filter
-        incomes = incomes.filter(category=category)
-        expenses = expenses.filter(category=category)
-
-    # Combine incomes and expenses
-    combined_data = []
-
-    # Add income data if filter is income or if no filter is set
-    if filter_type in ['', 'income']:
-        for income in incomes:
-            combined_data.append({
-                'id': income.id,
-                'type': 'income',
-                'category': income.category,
-                'amount': float(income.income),
-                'title': income.title,
-                'description': income.description,
-                'date': income.date.isoformat(),
-            })
-
-    # Add expense data if filter is expense or if no filter is set
-    if filter_type in ['', 'expense']:
-        for expense in expenses:
-            combined_data.append({
-                'id': expense.id,
-                'type': 'expense',
-                'category': expense.category,
-                'amount': float(expense.expense) * -1,
-                'title': expense.title,
-                'description': expense.description,
-                'date': expense.date.isoformat(),
-            })
-
-    # Sort by date ascending
-    combined_data.sort(key=lambda x: x['date'])
-
-    return JsonResponse({'finance': combined_data})
+    incomes, expenses = entries.filter_entries(user_id, start_date, end_date, category)
+    names = categories.names(user_id)
+
+    if not paginate:
+        # Full history in one response, sorted by date ascending
+        with serialization():
+            combined_data = [
+                entries.entry_to_json(row, names) for row in entries.merged_entries(incomes, expenses, filter_type)
+            ]
+        return JsonResponse({'finance': combined_data})
+
+    if order not in ['asc', 'desc']:
+        return JsonResponse({'error': 'order must be "asc" or "desc".'}, status=400)
+    descending = order == 'desc'
 
+    try:
+        limit = int(request.GET.get('limit', FINANCE_PAGE_SIZE))
+        cursor = request.GET.get('cursor')
+        cursor = _decode_cursor(cursor) if cursor else None
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid limit or cursor.'}, status=400)
+    limit = max(1, min(limit, FINANCE_MAX_PAGE_SIZE))
+
+    # Keyset pagination on (date, type, id): one UNION ALL query fetching
+    # limit + 1 rows past the cursor
+    merged = entries.merged_entries(incomes, expenses, filter_type, cursor, descending)
+    with serialization():
+        page = [entries.entry_to_json(row, names) for row in merged[:limit + 1]]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = _encode_cursor(page[-1])
+
+    return JsonResponse({'finance': page, 'next': next_cursor})
+
+@reads_from_replica
+def export_finance_entries(request, user_id):
+    # Same filters as finance_details, streamed in chunks instead of one JSON blob
+    export_format = request.GET.get('format', 'csv').lower()
+    if export_format not in entries.EXPORT_FORMATS:
+        return JsonResponse({'error': 'format must be "csv" or "ndjson".'}, status=400)
+
+    incomes, expenses = entries.filter_entries(
+        user_id,
+        request.GET.get('start_date'),
+        request.GET.get('end_date'),
+        request.GET.get('category'),
+    )
+    rows = entries.merged_entries(incomes, expenses, request.GET.get('type', '').lower())
+    # The rows are only fetched while the response streams, after reads_from_replica has
+    # restored the default alias, so pin them to the database the category names come from
+    rows = rows.using(read_alias())
+
+    response = StreamingHttpResponse(
+        entries.export_lines(
+            rows.iterator(chunk_size=entries.EXPORT_CHUNK_SIZE), export_format, categories.names(user_id)
+        ),
+        content_type=entries.EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="finances_{user_id}.{export_format}"'
+    return response
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.etag_func('budget-details'))
 def budget_details(request, user_id):
     try:
         # Get filters from query parameters
         category_filter = request.GET.get('category', None)
         month_year_filter = request.GET.get('month_year', None)
-
-        # Print the filters received in the request
-        print(f"Received Filters: category={category_filter}, month_year={month_year_filter}")
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
 
         # Start with base queryset
         budgets = MonthlyBudget.objects.filter(user_id=user_id)
 
         # Apply category filter if present
         if category_filter:
-            budgets = budgets.filter(category=category_filter)
+            budgets = budgets.filter(category_id=categories.find(user_id, category_filter))
 
         # Apply month-year filter if present
         if month_year_filter:
             try:
-                # Split the month_year filter into month and year
+                # Split the month_year filter (e.g. "5-2025") into month and year
                 month_str, year_str = month_year_filter.split('-')
-                month = str(month_str)  # month should remain as a string (since it's stored as CharField in the model)
-                year = int(year_str)
-
-                # Print out the filters being applied to the queryset
-                print(f"Applying Filter: month={month}, year={year}")
-
-                # Perform the filtering with month as a string and year as integer
-                budgets = budgets.filter(month=month, year=year)
+                budgets = budgets.filter(period=int(year_str) * 100 + int(month_str))
 
             except (ValueError, TypeError):
-                print(f"Invalid month_year parameter: {month_year_filter}")
+                logger.warning('Ignoring invalid month_year parameter %r', month_year_filter)
 
-        # Print the final queryset
-        print(f"Final Queryset: {budgets.query}")
+        # Apply date range filter if present: budgets of every month the range touches
+        if start_date and end_date:
+            try:
+                budgets = budgets.filter(period__range=(
+                    MonthlyBudget.period_of(datetime.strptime(start_date, '%Y-%m-%d')),
+                    MonthlyBudget.period_of(datetime.strptime(end_date, '%Y-%m-%d')),
+                ))
+            except ValueError:
+                logger.warning('Ignoring invalid budget date range %r - %r', start_date, end_date)
 
         # Serialize data
         serialized_data = []
-        for budget in budgets:
-            try:
-                amount = str(budget.amount)
-            except InvalidOperation:
-                amount = 'Invalid Amount'
-
-            serialized_data.append({
-                'id': budget.id,
-                'month': budget.month,
-                'category': budget.category,
-                'title': budget.title,
-                'year': budget.year,
-                'amount': amount,
-                'description': budget.description,
-            })
+        names = categories.names(user_id)
+        with serialization():
+            for budget in budgets:
+                try:
+                    amount = str(budget.amount)
+                except InvalidOperation:
+                    amount = 'Invalid Amount'
+
+                serialized_data.append({
+                    'id': budget.id,
+                    'month': budget.month,
+                    'category': names[budget.category_id],
+                    'title': budget.title,
+                    'year': budget.year,
+                    'amount': amount,
+                    'description': budget.description,
+                })
 
         return JsonResponse({'budget': serialized_data}, status=200)
 
-    except Exception as e:
-        print(f"Error fetching budget data for user {user_id}: {e}")
+    except Exception:
+        logger.exception('Error fetching budget data for user %s', user_id)
         return JsonResponse({'error': 'Internal server error.'}, status=500)
 
 
@@ -374,30 +647,36 @@ def update_finance_entry(request, user_id, entry_id):
         return JsonResponse({'error': 'At least one field (title, description, category, amount) is required for update.'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        if entry_type == 'income':
-            entry = Income.objects.get(id=entry_id, user_id=user_id)
-            if new_title:
-                entry.title = new_title
-            if new_description:
-                entry.description = new_description
-            if new_category:
-                entry.category = new_category
-            if new_amount is not None:
-                entry.income = new_amount
-            entry.save()
-        elif entry_type == 'expense':
-            entry = Expense.objects.get(id=entry_id, user_id=user_id)
-            if new_title:
-                entry.title = new_title
-            if new_description:
-                entry.description = new_description
-            if new_category:
-                entry.category = new_category
-            if new_amount is not None:
-                entry.expense = new_amount
-            entry.save()
-        else:
-            return JsonResponse({'error': 'Invalid type. Must be "income" or "expense".'}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            if entry_type == 'income':
+                entry = Income.objects.get(id=entry_id, user_id=user_id)
+                before = rollups.contribution(entry)
+                if new_title:
+                    entry.title = new_title
+                if new_description:
+                    entry.description = new_description
+                if new_category:
+                    entry.category_id = categories.get_or_create(user_id, new_category)
+                if new_amount is not None:
+                    entry.income = new_amount
+                entry.save()
+            elif entry_type == 'expense':
+                entry = Expense.objects.get(id=entry_id, user_id=user_id)
+                before = rollups.contribution(entry)
+                if new_title:
+                    entry.title = new_title
+                if new_description:
+                    entry.description = new_description
+                if new_category:
+                    entry.category_id = categories.get_or_create(user_id, new_category)
+                if new_amount is not None:
+                    entry.expense = new_amount
+                entry.save()
+            else:
+                return JsonResponse({'error': 'Invalid type. Must be "income" or "expense".'}, status=status.HTTP_400_BAD_REQUEST)
+
+            rollups.apply(added=[rollups.contribution(entry)], removed=[before])
+            caching.bump_version(user_id)
 
         return JsonResponse({'message': f'{entry_type.capitalize()} entry updated successfully.'}, status=status.HTTP_200_OK)
 
@@ -425,12 +704,14 @@ def update_budget_entry(request, user_id, entry_id):
         if new_description:
             entry.description = new_description
         if new_category:
-            entry.category = new_category
+            entry.category_id = categories.get_or_create(user_id, new_category)
         if new_amount is not None:
             entry.amount = new_amount
         
 
-        entry.save()
+        with transaction.atomic():
+            entry.save()
+            caching.bump_version(user_id)
 
         return JsonResponse({'message': 'Budget entry updated successfully.'}, status=status.HTTP_200_OK)
 
@@ -452,7 +733,10 @@ def delete_finance_entry(request, user_id, entry_id):
         else:
             return JsonResponse({'error': 'Invalid type. Must be "income" or "expense".'}, status=status.HTTP_400_BAD_REQUEST)
 
-        entry.delete()
+        with transaction.atomic():
+            rollups.entries_removed([entry])
+            entry.delete()
+            caching.bump_version(user_id)
         return JsonResponse({'message': f'{entry_type.capitalize()} entry deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
     except (Income.DoesNotExist, Expense.DoesNotExist):
@@ -464,18 +748,22 @@ def delete_budget_entry(request, user_id, entry_id):
         budget_entry = get_object_or_404(MonthlyBudget, id=entry_id, user_id=user_id)
         
         # Delete the entry
-        budget_entry.delete()
+        with transaction.atomic():
+            budget_entry.delete()
+            caching.bump_version(user_id)
         
         # Return a 204 No Content response
         return JsonResponse({}, status=204)  # Empty response body with status 204 (No Content)
     
     except MonthlyBudget.DoesNotExist:
         return JsonResponse({'error': 'Budget entry not found.'}, status=404)
-    except Exception as e:
-        # Log the error for debugging purposes
-        print(f"Error deleting budget entry: {str(e)}")
+    except Exception:
+        logger.exception('Error deleting budget entry %s for user %s', entry_id, user_id)
         return JsonResponse({'error': 'An error occurred while deleting the entry.'}, status=500)
 
+@reads_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.etag_func('reports', daily=True))
 @api_view(['GET'])
 def get_reports(request, user_id):
     try:
@@ -484,84 +772,77 @@ def get_reports(request, user_id):
         end_date = request.GET.get('end_date')
         category = request.GET.get('category')
 
-        # Expense categories (filtered if needed)
-        expense_qs = Expense.objects.filter(user_id=user_id)
-        if start_date and end_date:
-            expense_qs = expense_qs.filter(date__range=[start_date, end_date])
-        if category and category != 'all':
-            expense_qs = expense_qs.filter(category=category)
-        expense_categories = expense_qs.values('category').annotate(
-            total=Sum('expense')
-        ).order_by('-total')
-
-        # Monthly data (filtered if needed)
-        monthly_expense_qs = Expense.objects.filter(user_id=user_id)
-        if start_date and end_date:
-            monthly_expense_qs = monthly_expense_qs.filter(date__range=[start_date, end_date])
-        if category and category != 'all':
-            monthly_expense_qs = monthly_expense_qs.filter(category=category)
-        six_months_ago = datetime.now() - timedelta(days=180)
-        monthly_expense_qs = monthly_expense_qs.filter(date__gte=six_months_ago)
-        monthly_data = monthly_expense_qs.annotate(
-            month=TruncMonth('date')
-        ).values('month', 'category').annotate(
-            total=Sum('expense')
-        ).order_by('month')
-
-        # Process monthly data into income vs expenses format (expenses only, as before)
-        processed_monthly_data = []
-        current_month = None
-        month_data = {'income': 0, 'expenses': 0}
-        for item in monthly_data:
-            month_str = item['month'].strftime('%B %Y')
-            if current_month != month_str:
-                if current_month:
-                    processed_monthly_data.append({
-                        'month': current_month,
-                        'income': month_data['income'],
-                        'expenses': month_data['expenses']
-                    })
-                current_month = month_str
-                month_data = {'income': 0, 'expenses': 0}
-            if item['category'] == 'income':
-                month_data['income'] = item['total']
-            else:
-                month_data['expenses'] = item['total']
-        if current_month:
-            processed_monthly_data.append({
-                'month': current_month,
-                'income': month_data['income'],
-                'expenses': month_data['expenses']
-            })
-
-        # Calculate total income and expenses (filtered if needed)
-        income_qs = Income.objects.filter(user_id=user_id)
-        expense_qs = Expense.objects.filter(user_id=user_id)
-        if start_date and end_date:
-            income_qs = income_qs.filter(date__range=[start_date, end_date])
-            expense_qs = expense_qs.filter(date__range=[start_date, end_date])
-        if category and category != 'all':
-            income_qs = income_qs.filter(category=category)
-            expense_qs = expense_qs.filter(category=category)
-        total_income = income_qs.aggregate(total=Sum('income'))['total'] or 0
-        total_expenses = expense_qs.aggregate(total=Sum('expense'))['total'] or 0
-
-        # Overall income vs expenses for bar chart
-        overall_income_vs_expenses = {
-            'income': float(total_income),
-            'expenses': float(total_expenses)
+        if category == 'all':
+            category = None
+        if not (start_date and end_date):
+            start_date = end_date = None
+
+        # The monthly series window moves with the calendar, so it is part of the key
+        today = timezone.localdate()
+        params = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'category': category,
+            'window': reports.monthly_window_start(today).isoformat(),
         }
+        report = caching.cached(
+            'reports', user_id, params,
+            lambda: reports.build_report(user_id, start_date, end_date, category, today)
+        )
+        return Response(report)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
 
-        # Overall expense categories for pie chart
-        overall_expense_categories = list(expense_qs.values('category').annotate(total=Sum('expense')).order_by('-total'))
 
-        return Response({
-            'expense_categories': list(expense_categories),
-            'monthly_data': processed_monthly_data,
-            'total_income': float(total_income),
-            'total_expenses': float(total_expenses),
-            'overall_income_vs_expenses': overall_income_vs_expenses,
-            'overall_expense_categories': overall_expense_categories
-        })
-    except Exception as e:
-        return Response({'error': str(e)}, status=400)
\ No newline at end of file
+@reads_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.etag_func('budget-trends', daily=True))
+@api_view(['GET'])
+def budget_trends(request, user_id):
+    # Budget vs. actual per category for every month of a range; defaults to the last 12 months
+    today = timezone.localdate()
+    try:
+        end = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date() if request.GET.get('end_date') else today
+        start = (
+            datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date() if request.GET.get('start_date')
+            else budgets.default_start(end)
+        )
+    except ValueError:
+        return Response({'error': 'start_date and end_date must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if start > end:
+        return Response({'error': 'start_date must not be after end_date.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(budgets.months_between(start, end)) > budgets.MAX_MONTHS:
+        return Response({'error': f'The range can span at most {budgets.MAX_MONTHS} months.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    trends = caching.cached(
+        'budget-trends', user_id, {'start_date': start.isoformat(), 'end_date': end.isoformat()},
+        lambda: budgets.budget_vs_actual(user_id, start, end)
+    )
+    return Response(trends)
+
+
+@reads_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.etag_func('analytics', daily=True))
+@api_view(['GET'])
+def spending_analytics(request, user_id):
+    # Rolling statistics over the full history and a projection for the current month
+    try:
+        months = int(request.GET.get('months', analytics.DEFAULT_MONTHS))
+    except ValueError:
+        return Response({'error': 'months must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+    months = max(1, min(months, analytics.MAX_MONTHS))
+
+    today = timezone.localdate()
+    result = caching.cached(
+        'analytics', user_id, {'months': months, 'today': today.isoformat()},
+        lambda: analytics.spending_analytics(user_id, today, months)
+    )
+    return Response(result)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response(caching.stats())
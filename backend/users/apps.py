@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_migrate
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from . import usercache
+        user_logged_out.connect(usercache.forget_logged_out, dispatch_uid='users.usercache.forget_logged_out')
+        post_migrate.connect(usercache.clear, dispatch_uid='users.usercache.clear')
@@ -0,0 +1,27 @@
+from rest_framework import authentication, exceptions
+
+from . import tokens
+
+
+class JWTAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticates `Authorization: Bearer <access token>` requests from the
+    token's claims alone (see users.tokens), without a database query.
+    Requests without a bearer token are left to the next authentication class.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid Authorization header.')
+        try:
+            payload = tokens.decode(header[1].decode(), tokens.ACCESS)
+        except (tokens.InvalidToken, UnicodeError):
+            raise exceptions.AuthenticationFailed('Invalid or expired access token.')
+        return tokens.TokenUser(payload), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
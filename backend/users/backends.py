@@ -0,0 +1,11 @@
+from django.contrib.auth.backends import ModelBackend
+
+from . import usercache
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose per-request user lookup is served from users.usercache."""
+
+    def get_user(self, user_id):
+        user = usercache.get(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
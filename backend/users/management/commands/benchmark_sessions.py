@@ -0,0 +1,75 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+
+from backend.performance import percentile
+from finances import seeding
+from finances.management.commands.benchmark_endpoints import SCENARIOS
+from users import usercache
+
+# (label, settings): the database session store and uncached user lookups this
+# project started with, then the configured cached_db store and user cache
+CONFIGURATIONS = [
+    ('db sessions', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('cached sessions', {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the queries and latency that session authentication adds to each request, with the '
+        'database session store and uncached user lookups, and with the configured cached stores. '
+        'Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and configuration.')
+        parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS),
+                            default=['cache_stats', 'user-details', 'budget'], help='Endpoints to measure.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            user, = seeding.create_users(1, prefix='sessions', staff=True)
+            seeding.seed_user(user, 100, 900, budgets=12)
+            self.stdout.write(f'  {"endpoint":<16} {"configuration":<16} {"queries/req":>11} {"p50 ms":>9} {"p95 ms":>9}')
+            with override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0):
+                for name in options['only']:
+                    for label, config in CONFIGURATIONS:
+                        with override_settings(**config):
+                            self.measure(name, label, user, options['requests'])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+    def measure(self, name, label, user, count):
+        cache.clear()
+        usercache.clear()
+        client = Client()
+        client.force_login(user)
+        requests = SCENARIOS[name](client, user, count + 1)
+        next(requests)()  # Warms the session and user caches, where configured
+
+        timings, queries = [], 0
+        for request in requests:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                request()
+                timings.append(time.perf_counter() - started)
+            queries += len(captured)
+
+        timings.sort()
+        self.stdout.write(
+            f'  {name:<16} {label:<16} {queries / len(timings):11.1f} '
+            f'{percentile(timings, 0.50) * 1000:9.2f} {percentile(timings, 0.95) * 1000:9.2f}'
+        )
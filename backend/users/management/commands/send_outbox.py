@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Send queued outgoing email in batches over one mail connection per batch. '
+        'With --interval, keep polling the outbox every that many seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Seconds between polls when the outbox is empty; '
+                                                           'drain it once if omitted.')
+        parser.add_argument('--batch-size', type=int, help='Messages per batch; defaults to EMAIL_OUTBOX_BATCH_SIZE.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = outbox.send_pending(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed.')
+                continue
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,99 @@
+"""
+Persistent outbox for mail sent on behalf of requests.
+
+Views call enqueue(), which is a single INSERT. A worker (manage.py
+send_outbox) calls send_pending() in a loop: it claims a batch of due
+messages, sends them over one connection of the configured EMAIL_BACKEND and
+deletes the ones that went out. A failed message is retried after
+EMAIL_OUTBOX_RETRY_SECONDS, doubling with every attempt, and is marked failed
+after EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+Messages are claimed by stamping them with a random token and pushing their
+next attempt EMAIL_OUTBOX_LEASE_SECONDS ahead, so several workers can run at
+once, and a worker that dies mid-batch only delays its messages.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(subject, body, from_email, recipients):
+    """Queue a message for the next send_pending() run."""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or '',
+        recipients=list(recipients),
+        next_attempt_at=timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """Delay before the attempt after the given number of failed ones."""
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def _claim(batch_size, now):
+    due = list(OutgoingEmail.objects.filter(
+        status=OutgoingEmail.PENDING, next_attempt_at__lte=now
+    ).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size])
+    claim = uuid.uuid4()
+    # Rows another worker claimed in the meantime no longer match next_attempt_at__lte
+    claimed = OutgoingEmail.objects.filter(id__in=due, next_attempt_at__lte=now).update(
+        claim=claim, next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+    )
+    return list(OutgoingEmail.objects.filter(id__in=due, claim=claim).order_by('id')) if claimed else []
+
+
+def send_pending(batch_size=None):
+    """
+    Send one batch of due messages over a single connection. Returns
+    (sent, failed), counting messages that will be retried as failed.
+    """
+    now = timezone.now()
+    emails = _claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE, now)
+    if not emails:
+        return 0, 0
+
+    sent, retried = [], []
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for email in emails:
+                message = EmailMessage(
+                    email.subject, email.body, email.from_email or None, email.recipients, connection=connection
+                )
+                try:
+                    message.send()
+                except Exception as error:
+                    logger.warning('Sending outgoing email %s failed: %s', email.id, error)
+                    email.last_error = str(error)
+                    retried.append(email)
+                else:
+                    sent.append(email.id)
+    except Exception as error:
+        # Opening (or closing) the connection failed; retry whatever was not sent
+        logger.warning('Outgoing email connection failed: %s', error)
+        retried = [email for email in emails if email.id not in sent]
+        for email in retried:
+            email.last_error = str(error)
+
+    for email in retried:
+        email.attempts += 1
+        email.claim = None
+        if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            email.status = OutgoingEmail.FAILED
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+    if retried:
+        OutgoingEmail.objects.bulk_update(retried, ['attempts', 'claim', 'status', 'next_attempt_at', 'last_error'])
+    if sent:
+        OutgoingEmail.objects.filter(id__in=sent).delete()
+    return len(sent), len(retried)
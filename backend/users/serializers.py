@@ -47,6 +47,9 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         return attrs
 
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=True)
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
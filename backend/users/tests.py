@@ -1,3 +1,206 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from finances import querybudget
+from finances.querybudget import QueryBudget
+
+from . import outbox, tokens, urls, usercache
+from .models import OutgoingEmail
+
+User = get_user_model()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class PasswordResetOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='secret-pass-123')
+
+    def request_reset(self, email='alice@example.com'):
+        response = self.client.post(reverse('password-reset'), {'email': email}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_view_only_enqueues(self):
+        self.request_reset()
+        self.request_reset('nobody@example.com')
+        self.assertEqual(mail.outbox, [])
+        email, = OutgoingEmail.objects.all()
+        self.assertEqual(email.recipients, ['alice@example.com'])
+        self.assertIn('/reset-password/', email.body)
+
+    def test_worker_sends_batches_over_one_connection(self):
+        for _ in range(5):
+            self.request_reset()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as opened:
+            self.assertEqual(outbox.send_pending(batch_size=3), (3, 0))
+            self.assertEqual(outbox.send_pending(batch_size=3), (2, 0))
+        self.assertEqual(opened.call_count, 2)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+        self.assertFalse(OutgoingEmail.objects.exists())
+        self.assertEqual(outbox.send_pending(), (0, 0))
+
+    def test_failures_are_retried_with_backoff_then_marked_failed(self):
+        self.request_reset()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+            self.assertEqual(outbox.send_pending(), (0, 1))
+            email = OutgoingEmail.objects.get()
+            self.assertEqual((email.status, email.attempts, email.last_error), (OutgoingEmail.PENDING, 1, 'refused'))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(outbox.send_pending(), (0, 0))  # Not due yet
+
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(outbox.send_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.FAILED, 2))
+        self.assertEqual(outbox.send_pending(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_connection_failure_retries_the_whole_batch(self):
+        self.request_reset()
+        self.request_reset()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('unreachable')):
+            self.assertEqual(outbox.send_pending(), (0, 2))
+        self.assertEqual(OutgoingEmail.objects.filter(attempts=1, claim=None).count(), 2)
+
+    def test_claimed_messages_are_not_sent_twice(self):
+        self.request_reset()
+        email = OutgoingEmail.objects.get()
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now() + timedelta(minutes=5))  # Leased by another worker
+        self.assertEqual(outbox.send_pending(), (0, 0))
+        self.assertEqual(outbox.retry_delay(3), timedelta(minutes=4))
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 0)
+
+    def test_send_outbox_command_drains_the_outbox(self):
+        for _ in range(3):
+            self.request_reset()
+        call_command('send_outbox', batch_size=2, stdout=mock.Mock())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='secret-pass-123', is_staff=True
+        )
+
+    def login(self):
+        response = self.client.post(
+            reverse('login'), {'email': 'alice@example.com', 'password': 'secret-pass-123'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.logout()  # Only the tokens authenticate from here on
+        return response.json()
+
+    def get(self, url, token):
+        return self.client.get(url, headers={'Authorization': f'Bearer {token}'})
+
+    def test_access_token_authenticates_without_queries(self):
+        access = self.login()['access']
+        with self.assertNumQueries(0):
+            response = self.get(reverse('cache_stats'), access)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(reverse('user-details'), access)
+        self.assertEqual(response.json()['email'], 'alice@example.com')
+
+    def test_invalid_tokens_are_rejected(self):
+        pair = self.login()
+        expired = tokens._encode({'sub': str(self.user.pk)}, tokens.ACCESS, -1)
+        for token in [expired, pair['refresh'], pair['access'][:-2] + 'xx']:
+            with self.subTest(token=token):
+                response = self.get(reverse('user-details'), token)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        self.assertEqual(self.client.get(reverse('user-details')).status_code, 401)
+
+    def test_refresh_issues_a_new_pair_until_the_password_changes(self):
+        refresh = self.login()['refresh']
+        response = self.client.post(reverse('token-refresh'), {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(reverse('user-details'), response.json()['access']).status_code, 200)
+
+        self.user.set_password('another-pass-456')
+        self.user.save()
+        response = self.client.post(reverse('token-refresh'), {'refresh': refresh}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        usercache.clear()
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='secret-pass-123', is_staff=True
+        )
+        self.client.force_login(self.user)
+
+    def warm(self):
+        # Users are only cached once their transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(reverse('cache_stats')).status_code, 200)
+
+    def test_cached_session_and_user_need_no_queries(self):
+        self.warm()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('cache_stats')).status_code, 200)
+
+    def test_lookups_get_their_own_copy(self):
+        self.warm()
+        first = usercache.get(self.user.pk)
+        first.email = 'changed@example.com'
+        self.assertEqual(usercache.get(self.user.pk).email, 'alice@example.com')
+        self.assertIsNone(usercache.get(0))
+
+    @override_settings(USER_CACHE_SIZE=1)
+    def test_least_recently_used_user_is_evicted(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='secret-pass-123')
+        with self.captureOnCommitCallbacks(execute=True):
+            usercache.get(self.user.pk)
+            usercache.get(other.pk)
+        with self.assertNumQueries(1):
+            usercache.get(self.user.pk)
+
+    @override_settings(USER_CACHE_TIMEOUT=0)
+    def test_expired_users_are_reloaded(self):
+        self.warm()
+        with self.assertNumQueries(1):
+            usercache.get(self.user.pk)
+
+    def test_password_reset_ends_cached_sessions(self):
+        self.warm()
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        url = reverse('password-reset-confirm', args=[uid, default_token_generator.make_token(self.user)])
+        data = {'password': 'another-pass-456', 'password2': 'another-pass-456'}
+        response = Client().post(url, data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('user-details')).status_code, 401)
+
+    def test_logout_forgets_the_user(self):
+        self.warm()
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 200)
+        self.assertNotIn(self.user.pk, usercache._cache)
+
+
+class UserQueryBudgetTests(querybudget.QueryBudgetTestCase):
+    urlconf = urls
+    budgets = {
+        'register': QueryBudget(queries=6, rows=4),
+        'login': QueryBudget(queries=6, rows=3),
+        'token-refresh': QueryBudget(queries=1, rows=1),
+        'logout': QueryBudget(queries=10, rows=2),
+        'password-reset': QueryBudget(queries=4, rows=3),
+        'password-reset-confirm': QueryBudget(queries=7, rows=3),
+        'csrf': QueryBudget(queries=0, rows=0),
+        'user-details': QueryBudget(queries=2, rows=2),
+    }
@@ -0,0 +1,78 @@
+"""
+Signed (HS256) JSON Web Tokens for the API.
+
+An access token carries everything a request needs about its user (id, email,
+staff flag), so users.authentication.JWTAuthentication checks one HMAC and
+touches neither the session table nor the user table. Access tokens live for
+JWT_ACCESS_TOKEN_SECONDS; clients trade a refresh token (JWT_REFRESH_TOKEN_SECONDS)
+for a new pair at the token-refresh endpoint. Refreshing loads the user, and a
+refresh token stops working when the user's password changes or the account is
+deactivated, since it embeds the same password-derived hash sessions use.
+"""
+from datetime import timedelta
+
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+InvalidToken = jwt.InvalidTokenError
+
+
+class TokenUser:
+    """The request.user of a token-authenticated request, built from the access token's claims."""
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, payload):
+        self.id = self.pk = int(payload['sub'])
+        self.email = payload.get('email', '')
+        self.is_staff = payload.get('staff', False)
+
+    def __str__(self):
+        return self.email
+
+
+def _encode(claims, token_type, lifetime):
+    now = timezone.now()
+    claims = {**claims, 'type': token_type, 'iat': now, 'exp': now + timedelta(seconds=lifetime)}
+    return jwt.encode(claims, settings.JWT_SIGNING_KEY, algorithm=settings.JWT_ALGORITHM)
+
+
+def issue(user):
+    """Return a fresh access/refresh token pair for user."""
+    return {
+        'access': _encode(
+            {'sub': str(user.pk), 'email': user.email, 'staff': user.is_staff},
+            ACCESS, settings.JWT_ACCESS_TOKEN_SECONDS,
+        ),
+        'refresh': _encode(
+            {'sub': str(user.pk), 'auth': user.get_session_auth_hash()},
+            REFRESH, settings.JWT_REFRESH_TOKEN_SECONDS,
+        ),
+        'expires_in': settings.JWT_ACCESS_TOKEN_SECONDS,
+    }
+
+
+def decode(token, token_type):
+    """Return the verified claims of a token of token_type; raises InvalidToken."""
+    payload = jwt.decode(
+        token, settings.JWT_SIGNING_KEY, algorithms=[settings.JWT_ALGORITHM],
+        options={'require': ['sub', 'type', 'exp']},
+    )
+    if payload['type'] != token_type:
+        raise InvalidToken(f'Expected a {token_type} token')
+    return payload
+
+
+def refresh(token):
+    """Return a new token pair for a valid refresh token; raises InvalidToken."""
+    payload = decode(token, REFRESH)
+    user = get_user_model().objects.filter(pk=payload['sub'], is_active=True).first()
+    if user is None or payload.get('auth') != user.get_session_auth_hash():
+        raise InvalidToken('The user no longer exists or has changed their password')
+    return issue(user)
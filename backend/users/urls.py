@@ -3,6 +3,7 @@ from .views import (
     UserRegistrationView,
     UserLoginView,
     UserLogoutView,
+    TokenRefreshView,
     PasswordResetView,
     PasswordResetConfirmView,
     get_csrf_token,
@@ -12,6 +13,7 @@ from .views import (
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
     path('login/', UserLoginView.as_view(), name='login'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
     path('password-reset/', PasswordResetView.as_view(), name='password-reset'),
     path('password-reset-confirm/<uidb64>/<token>/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
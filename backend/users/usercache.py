@@ -0,0 +1,68 @@
+"""
+Process-local LRU cache of CustomUser rows for session authentication.
+
+AuthenticationMiddleware loads the session's user on every authenticated
+request; users.backends.CachedModelBackend serves that lookup from here, so a
+request whose session is also cached (SESSION_ENGINE cached_db) reaches the
+view without a query. Users are kept for settings.USER_CACHE_TIMEOUT seconds,
+at most settings.USER_CACHE_SIZE at a time, and each lookup gets its own copy,
+so a view modifying request.user never affects another request.
+
+As in finances.categories, only committed rows are cached. A user is dropped
+when their password is reset and when they log out; other processes pick up
+changes to a user when their cached copy expires.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+_Entry = namedtuple('_Entry', ['loaded_at', 'user'])
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # user id -> _Entry, least recently used first
+
+
+def _remember(user_id, entry):
+    with _lock:
+        _cache[user_id] = entry
+        _cache.move_to_end(user_id)
+        while len(_cache) > settings.USER_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def get(user_id):
+    """Return a copy of the user with this id, or None if there is none."""
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and time.monotonic() - entry.loaded_at < settings.USER_CACHE_TIMEOUT:
+            _cache.move_to_end(user_id)
+            return copy.copy(entry.user)
+
+    entry = _Entry(time.monotonic(), get_user_model()._default_manager.filter(pk=user_id).first())
+    if entry.user is None:
+        return None
+    # Runs immediately outside a transaction, and not at all if this one rolls back
+    transaction.on_commit(lambda: _remember(user_id, entry))
+    return copy.copy(entry.user)
+
+
+def forget(user_id):
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+def forget_logged_out(sender, request, user, **kwargs):
+    """user_logged_out receiver."""
+    if user is not None:
+        forget(user.pk)
+
+
+def clear(**kwargs):
+    """Empty the cache; also a post_migrate receiver, as flushing the database reuses ids."""
+    with _lock:
+        _cache.clear()
@@ -6,20 +6,19 @@ from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.core.mail import send_mail
 from django.conf import settings
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
+from . import outbox, tokens, usercache
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
     PasswordResetSerializer,
     PasswordResetConfirmSerializer,
+    TokenRefreshSerializer,
     UserSerializer
 )
-import jwt
-from datetime import datetime, timedelta
 
 User = get_user_model()
 
@@ -50,13 +49,29 @@ class UserLoginView(APIView):
                 login(request, user)
                 return Response({
                     'message': 'Login successful',
-                    'user_id': user.id
+                    'user_id': user.id,
+                    **tokens.issue(user),
                 })
             return Response({
                 'error': 'Invalid credentials'
             }, status=status.HTTP_401_UNAUTHORIZED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TokenRefreshView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        serializer = TokenRefreshSerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                return Response(tokens.refresh(serializer.validated_data['refresh']))
+            except tokens.InvalidToken:
+                return Response({
+                    'error': 'Invalid or expired refresh token'
+                }, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 class UserLogoutView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -79,12 +94,12 @@ class PasswordResetView(APIView):
                 
                 reset_link = f"{settings.FRONTEND_URL}/reset-password/{uid}/{token}/"
                 
-                send_mail(
+                # Sent by the send_outbox worker, so a slow mail server does not hold up the request
+                outbox.enqueue(
                     'Password Reset Request',
                     f'Click the link to reset your password: {reset_link}',
                     settings.EMAIL_HOST_USER,
                     [email],
-                    fail_silently=False,
                 )
                 
             return Response({
@@ -107,6 +122,8 @@ class PasswordResetConfirmView(APIView):
             if user and default_token_generator.check_token(user, token):
                 user.set_password(serializer.validated_data['password'])
                 user.save()
+                # Otherwise this process keeps authenticating sessions against the old password
+                usercache.forget(user.pk)
                 return Response({'message': 'Password has been reset successfully'})
             
             return Response({
@@ -124,5 +141,9 @@ def get_user_details(request):
     """
     Get details of the currently authenticated user
     """
-    serializer = UserSerializer(request.user)
+    user = request.user
+    if not isinstance(user, User):
+        # Token-authenticated requests only carry the claims in the token
+        user = User.objects.get(pk=user.pk)
+    serializer = UserSerializer(user)
     return Response(serializer.data)
@@ -65,32 +65,18 @@ export default function Dashboard() {
   const fetchData = async (userId) => {
     try {
       const { start, end } = getCurrentMonthDates();
-      
-      // Fetch budget summary for current month
-      const budgetResponse = await axios.post('/api/finances/budget/', {
-        user_id: userId,
-        start_date: start,
-        end_date: end
-      });      
-      console.log(userId)
-      console.log(start)
-      console.log(end)
+
+      // Budget summary for the current month and the latest transactions in one request
+      const response = await axios.get(`/api/finances/${userId}/dashboard/`, {
+        params: { start_date: start, end_date: end }
+      });
+      const { budget, recent } = response.data;
       setBudgetData({
-        totalIncome: budgetResponse.data.total_income || 0,
-        totalExpense: budgetResponse.data.total_expense || 0,
-        remainingBudget: budgetResponse.data.budget || 0
+        totalIncome: budget.total_income || 0,
+        totalExpense: budget.total_expense || 0,
+        remainingBudget: budget.budget || 0
       });
-
-      // Fetch transactions
-      const financeResponse = await axios.get(`/api/finances/${userId}/finance-details/`);
-      
-      if (financeResponse.data.finance) {
-        // Sort by date, most recent first
-        const sortedTransactions = financeResponse.data.finance.sort(
-          (a, b) => new Date(b.date) - new Date(a.date)
-        );
-        setTransactions(sortedTransactions);
-      }
+      setTransactions(recent || []);
     } catch (error) {
       console.error('Error fetching data:', error);
       setMessage('Failed to fetch data');
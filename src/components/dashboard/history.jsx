@@ -1,7 +1,6 @@
 import { useEffect, useState } from 'react';
 import axios from 'axios';
 import { useAuth } from '../../contexts/AuthContext';
-import { exportToCSV } from '../../contexts/FinanceContext';
 import Card from '../ui/Card';
 import Filters from '../ui/HistoryFilter'; 
 import TransactionTable from "../finance/TransactionTable";
@@ -12,6 +11,8 @@ export default function History() {
   const { user } = useAuth();
   const [userId, setUserId] = useState(null);
   const [financeData, setFinanceData] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   
@@ -48,13 +49,20 @@ export default function History() {
     }
   }, [dateRange]);
 
-  const fetchFinanceDetails = async () => {
+  const fetchFinanceDetails = async (cursor = null) => {
       try {
-        setLoading(true);
+        if (cursor) {
+          setLoadingMore(true);
+        } else {
+          setLoading(true);
+        }
         let url = `/api/finances/${userId}/finance-details/`;
 
         // Add query parameters based on filters
-        const params = new URLSearchParams();
+        const params = new URLSearchParams({ order: 'desc', limit: '50' });
+        if (cursor) {
+          params.append('cursor', cursor);
+        }
 
         if (selectedType !== 'all') {  
           params.append('type', selectedType);
@@ -76,10 +84,10 @@ export default function History() {
         const response = await axios.get(url);
 
         if (response.data.finance) {
-          const sortedData = response.data.finance.sort((a, b) =>
-            new Date(b.date) - new Date(a.date)
-          );
+          // Pages arrive newest first; later pages are appended
+          const sortedData = cursor ? [...financeData, ...response.data.finance] : response.data.finance;
           setFinanceData(sortedData);
+          setNextCursor(response.data.next);
 
           const hardcodedCategories = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Misc'];
 
@@ -96,11 +104,28 @@ export default function History() {
         setError('Failed to load transaction history');
       } finally {
         setLoading(false);
+        setLoadingMore(false);
       }
   };
 
   
 
+  // The server streams the full filtered history, not just the pages loaded here
+  const handleExport = () => {
+    const params = new URLSearchParams({ format: 'csv' });
+    if (selectedType !== 'all') {
+      params.append('type', selectedType);
+    }
+    if (dateRange.start && dateRange.end) {
+      params.append('start_date', dateRange.start);
+      params.append('end_date', dateRange.end);
+    }
+    if (selectedCategory !== 'all') {
+      params.append('category', selectedCategory);
+    }
+    window.location.href = `/api/finances/${userId}/export/?${params.toString()}`;
+  };
+
   const handleDelete = async (userId, entryId, entryType) => {
     const confirmed = window.confirm(`Are you sure you want to delete this ${entryType} entry?`);
   
@@ -204,7 +229,7 @@ export default function History() {
           <h1 className="text-2xl font-bold">Transaction History</h1>
           <div className="flex items-center gap-4">
             <button
-              onClick={() => exportToCSV(financeData, { selectedType, selectedCategory, dateRange })}
+              onClick={handleExport}
               className="flex items-center gap-2 px-4 py-2 text-sm font-medium text-gray-600 bg-white border border-gray-300 rounded-lg hover:bg-gray-50 transition-colors"
             >
               <Download className="h-4 w-4" />
@@ -248,6 +273,17 @@ export default function History() {
         userId={userId}
       />
 
+      {nextCursor && (
+        <div className="flex justify-center mt-4">
+          <button
+            onClick={() => fetchFinanceDetails(nextCursor)}
+            disabled={loadingMore}
+            className="px-4 py-2 text-sm font-medium text-gray-600 bg-white border border-gray-300 rounded-lg hover:bg-gray-50 transition-colors disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
 
       </Card>
     </div>